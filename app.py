@@ -17,14 +17,40 @@ Upgrade v2:
 - "Gabriel"-Regel: Wenn aktiv, keine Reste
 """
 
+import atexit
+import bisect
+import csv
+import hashlib
+import html
+import io
 import json
+import logging
 import math
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import asdict, dataclass
+from functools import lru_cache
+from string import Template
 
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 # Optional: editable dark-themed grid (fallback to st.data_editor if unavailable)
 try:
     from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
@@ -32,6 +58,15 @@ try:
 except Exception:
     AGGRID_AVAILABLE = False
 
+log = logging.getLogger("pizza_dough")
+
+# Optional: pure-Python PDF backend for printable recipe cards (HTML-only if unavailable)
+try:
+    from fpdf import FPDF
+    FPDF_AVAILABLE = True
+except Exception:
+    FPDF_AVAILABLE = False
+
 # Safe check: only touch session_state when a Streamlit context exists
 try:
     from streamlit.runtime.scriptrunner import get_script_run_ctx  # available in newer Streamlit
@@ -129,6 +164,56 @@ STRINGS = {
         ),
         "toast": "Berechnung aktualisiert",
         "upload_cfg": "JSON hochladen",
+        "cards": "Rezeptkarten (Batch)",
+        "cards_caption": "• CSV mit einer Zeile pro Event: Spalten 'event', 'hydration', 'gabriel' und je eine Spalte pro Esser‑Typ (Anzahl).",
+        "cards_template": "CSV‑Vorlage herunterladen",
+        "cards_upload": "Events (CSV) hochladen",
+        "cards_html": "Karten als HTML",
+        "cards_pdf": "Karten als PDF",
+        "cards_count": "{n} Karten bereit",
+        "cards_download": "{file} herunterladen",
+        "cards_unmatched": "Spalten ohne passenden Esser‑Typ (ignoriert): {cols}",
+        "cards_bad": "{n} ungültige Werte – diese Zeilen werden übersprungen:",
+        "cards_bad_cell": "Zeile {row}, Spalte '{col}': '{value}'",
+        "cards_csv_error": "CSV konnte nicht gelesen werden: {err}",
+        "event": "Event",
+        "flour_search": "Mehl suchen",
+        "flour_pick": "Mehlsorte",
+        "flour_generic": "Standardmehl",
+        "flour_info": "Protein {protein:.1f} % • W{w:.0f} • empfohlene Hydration {hyd:.0f} % • {ppk:.2f} Standard‑Pizzen/kg",
+        "inverse": "Umkehrrechnung: Wie viele Gäste reicht der Vorrat?",
+        "inverse_caption": "• Leere Eingabefelder gelten als unbegrenzt. Hydration und Rezept wie oben; der aktuelle Esser‑Mix wird hochskaliert.",
+        "stock_flour_kg": "Mehl vorrätig (kg)",
+        "stock_yeast_g": "Hefe vorrätig (g)",
+        "stock_salt_g": "Salz vorrätig (g)",
+        "max_pizzas": "Max. ganze Pizzen",
+        "limiting": "Begrenzt durch",
+        "max_alone": "Max. Gäste (nur dieser Typ)",
+        "mix_result": "Aktueller Mix passt **{units}×** ⇒ {guests}",
+        "inventory_upload": "Vorratstabelle (CSV: flour_g, water_ml, yeast_g, salt_g je Standort; fehlende Spalten = unbegrenzt, leere Zellen = 0)",
+        "inventory_missing": "Die Vorratstabelle braucht mindestens eine dieser Spalten: {cols}",
+        "inventory_error": "Vorratstabelle konnte nicht gelesen werden: {err}",
+        "computed": "berechnet",
+        "stats": "Statistik (Berechnungs‑Log)",
+        "stats_days": "Zeitraum (Tage)",
+        "stats_count": "Berechnungen",
+        "stats_guests": "Ø Gäste pro Event",
+        "stats_pizzas": "Ø Pizzen pro Event",
+        "stats_flour_month": "Mehl pro Monat (kg)",
+        "oil": "Öl",
+        "sugar": "Zucker",
+        "malt": "Diastatisches Malz",
+        "oil_per_kg": "Öl pro 1 kg Mehl (g)",
+        "sugar_per_kg": "Zucker pro 1 kg Mehl (g)",
+        "malt_per_kg": "Diastatisches Malz pro 1 kg Mehl (g)",
+        "preferment": "Vorteig",
+        "preferment_flour_pct": "Mehlanteil im Vorteig (%)",
+        "none": "Keiner (direkte Führung)",
+        "poolish": "Poolish",
+        "biga": "Biga",
+        "main": "Hauptteig",
+        "preferment_capped": "Bei {hyd} % Hydration reicht das Wasser nur für {max} % Mehl im {pre} – Anteil von {pct} % auf {max} % begrenzt.",
+        "stages": "Zutaten je Stufe",
     },
     "en": {
         "title": "🍕 Pizza Dough Wizard",
@@ -185,6 +270,56 @@ STRINGS = {
         ),
         "toast": "Calculation updated",
         "upload_cfg": "Upload JSON",
+        "cards": "Recipe cards (batch)",
+        "cards_caption": "• CSV with one row per event: columns 'event', 'hydration', 'gabriel' and one column per eater type (count).",
+        "cards_template": "Download CSV template",
+        "cards_upload": "Upload events (CSV)",
+        "cards_html": "Cards as HTML",
+        "cards_pdf": "Cards as PDF",
+        "cards_count": "{n} cards ready",
+        "cards_download": "Download {file}",
+        "cards_unmatched": "Columns matching no eater type (ignored): {cols}",
+        "cards_bad": "{n} invalid values – these rows are skipped:",
+        "cards_bad_cell": "Row {row}, column '{col}': '{value}'",
+        "cards_csv_error": "Could not read CSV: {err}",
+        "event": "Event",
+        "flour_search": "Search flour",
+        "flour_pick": "Flour",
+        "flour_generic": "Generic flour",
+        "flour_info": "Protein {protein:.1f}% • W{w:.0f} • recommended hydration {hyd:.0f}% • {ppk:.2f} standard pizzas/kg",
+        "inverse": "Reverse: how many guests does our stock cover?",
+        "inverse_caption": "• Empty input fields count as unlimited. Hydration and recipe as above; the current eater mix is scaled up.",
+        "stock_flour_kg": "Flour on hand (kg)",
+        "stock_yeast_g": "Yeast on hand (g)",
+        "stock_salt_g": "Salt on hand (g)",
+        "max_pizzas": "Max. whole pizzas",
+        "limiting": "Limited by",
+        "max_alone": "Max. guests (this type only)",
+        "mix_result": "Current mix fits **{units}×** ⇒ {guests}",
+        "inventory_upload": "Stock table (CSV: flour_g, water_ml, yeast_g, salt_g per location; missing columns = unlimited, empty cells = 0)",
+        "inventory_missing": "The stock table needs at least one of these columns: {cols}",
+        "inventory_error": "Could not read stock table: {err}",
+        "computed": "computed",
+        "stats": "Statistics (calculation log)",
+        "stats_days": "Period (days)",
+        "stats_count": "Calculations",
+        "stats_guests": "Avg. guests per event",
+        "stats_pizzas": "Avg. pizzas per event",
+        "stats_flour_month": "Flour per month (kg)",
+        "oil": "Oil",
+        "sugar": "Sugar",
+        "malt": "Diastatic malt",
+        "oil_per_kg": "Oil per 1 kg flour (g)",
+        "sugar_per_kg": "Sugar per 1 kg flour (g)",
+        "malt_per_kg": "Diastatic malt per 1 kg flour (g)",
+        "preferment": "Preferment",
+        "preferment_flour_pct": "Share of flour in preferment (%)",
+        "none": "None (direct dough)",
+        "poolish": "Poolish",
+        "biga": "Biga",
+        "main": "Main dough",
+        "preferment_capped": "At {hyd}% hydration there is only enough water for {max}% of the flour in the {pre}; share reduced from {pct}% to {max}%.",
+        "stages": "Ingredients per stage",
     },
 }
 
@@ -202,9 +337,424 @@ class Recipe:
     yeast_per_kg: float = 7.0
     salt_per_kg: float = 32.0
     normal_pizza_g: float = 273.1667
+    oil_per_kg: float = 0.0
+    sugar_per_kg: float = 0.0
+    malt_per_kg: float = 0.0
+    preferment: str = "none"            # none | poolish | biga
+    preferment_flour_pct: float = 0.0   # Anteil des Mehls im Vorteig (%)
+
+
+# Bäckerprozente: jede Zutat relativ zur Mehlmenge (Mehl = 1.0). Reihenfolge = Spalten der Vektoren/Matrizen.
+INGREDIENTS = ("flour", "water", "yeast", "salt", "oil", "sugar", "malt")
+# Vorteig‑Hydration (Wasser/Mehl im Vorteig); die gesamte Hefe geht in den Vorteig
+PREFERMENTS = {"poolish": 1.0, "biga": 0.5}
+PREFERMENT_DEFAULT_PCT = {"poolish": 30, "biga": 50}  # Startwert beim Wechsel von direkter Führung
+HYDRATION_MIN, HYDRATION_MAX = 50, 100  # Grenzen des Hydration‑Sliders (auch für CSV‑Events)
+
+
+@dataclass
+class Flour:
+    sku: str
+    name: str
+    protein_pct: float = 12.0
+    w_strength: float = 260.0
+    hydration_pct: float = 60.0   # empfohlene Hydration für dieses Mehl
+    yield_factor: float = 1.0     # Multiplikator auf Recipe.pizzas_per_kg (Wasseraufnahme ⇒ mehr/weniger Teig)
+
+
+# ---------- Mehl-Katalog ----------
+FLOUR_CATALOG_PATH = os.environ.get(
+    "PIZZA_FLOUR_CATALOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "flours.csv")
+)
+
+
+FLOUR_NUMBER_COLUMNS = ("protein_pct", "w_strength", "hydration_pct", "yield_factor")
+
+
+class FlourCatalog:
+    """Lieferanten‑Katalog (CSV) per mmap; nur ein sortierter Namensindex liegt im Speicher.
+
+    Jede Zeile wird beim Indexieren einmal geprüft, Treffer werden danach aus der gemappten
+    Datei geparst – tausende SKUs pro Prozess werden so nie komplett geladen.
+    Ungültige Zeilen (fehlende SKU/Name, keine Zahl) landen in `skipped` statt im Index.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        end = self._mm.find(b"\n")
+        if end == -1:
+            end = len(self._mm)
+        self._columns = [c.strip() for c in self._parse(0, end)]
+        missing = [c for c in ("sku", "name") if c not in self._columns]
+        if missing:
+            self.close()
+            raise ValueError(f"flour catalog {path} lacks column(s): {', '.join(missing)}")
+        index, self.skipped = [], []
+        pos, line_no = end + 1, 1
+        while 0 < pos < len(self._mm):
+            end = self._mm.find(b"\n", pos)
+            if end == -1:
+                end = len(self._mm)
+            line_no += 1
+            if self._mm[pos:end].strip():
+                try:
+                    flour = self._flour(self._parse(pos, end))
+                    index.append((flour.name.casefold(), pos))
+                except (UnicodeDecodeError, ValueError):
+                    self.skipped.append(line_no)
+            pos = end + 1
+        index.sort()
+        self._keys = [k for k, _ in index]
+        self._offsets = [o for _, o in index]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _parse(self, start: int, end: int) -> list:
+        # utf-8-sig: Excel speichert CSV mit BOM vor der Kopfzeile
+        line = self._mm[start:end].decode("utf-8-sig").rstrip("\r")
+        return next(csv.reader([line]), [])
+
+    def _flour(self, fields: list) -> Flour:
+        row = {k: v.strip() for k, v in zip(self._columns, fields)}
+        if not row.get("sku") or not row.get("name"):
+            raise ValueError("sku and name are required")
+        numbers = {k: float(row[k]) for k in FLOUR_NUMBER_COLUMNS if row.get(k)}
+        if not all(math.isfinite(v) and v > 0 for v in numbers.values()):
+            raise ValueError("numbers must be positive")
+        return Flour(sku=row["sku"], name=row["name"], **numbers)
+
+    def _row(self, offset: int) -> Flour:
+        end = self._mm.find(b"\n", offset)
+        return self._flour(self._parse(offset, end if end != -1 else len(self._mm)))
+
+    def search(self, prefix: str, limit: int = 20) -> list:
+        """Mehle, deren Name mit `prefix` beginnt (Groß/Klein egal), alphabetisch."""
+        key = prefix.strip().casefold()
+        i = bisect.bisect_left(self._keys, key)
+        hits = []
+        while i < len(self._keys) and len(hits) < limit and self._keys[i].startswith(key):
+            hits.append(self._row(self._offsets[i]))
+            i += 1
+        return hits
+
+
+@st.cache_resource
+def load_flour_catalog(path: str = FLOUR_CATALOG_PATH):
+    """Einmal pro Prozess laden und über alle Sessions teilen; None, wenn kein (lesbarer) Katalog vorhanden."""
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        return None
+    try:
+        catalog = FlourCatalog(path)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        log.warning("flour catalog %s not loaded: %s", path, e)
+        return None
+    if catalog.skipped:
+        log.warning("flour catalog %s: skipped %d invalid row(s), lines %s", path, len(catalog.skipped),
+                    ", ".join(map(str, catalog.skipped[:20])))
+    return catalog
+
+
+# ---------- Session-Backend (extern, für mehrere Worker) ----------
+# memory = prozesslokal (wie bisher, Sticky Sessions nötig) • file / kv = von allen Workern geteilt
+SESSION_BACKEND = os.environ.get("PIZZA_SESSION_BACKEND", "memory")
+SESSION_PATH = os.environ.get(
+    "PIZZA_SESSION_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sessions")
+)
+SESSION_FORMAT_VERSION = 1
+# Sessions ohne Zugriff werden nach SESSION_TTL_S entfernt; memory zusätzlich als LRU begrenzt
+SESSION_TTL_S = float(os.environ.get("PIZZA_SESSION_TTL_S", 7 * 86400))
+SESSION_MEMORY_MAX = int(os.environ.get("PIZZA_SESSION_MEMORY_MAX", 1000))
+_SID_RE = re.compile(r"[0-9a-f]{32}")
+
+
+
+class _FailureLatch:
+    """Loggt Fehler von Hintergrund‑Threads nur beim Zustandswechsel (ok ⇒ Fehler ⇒ ok), nicht bei jedem Retry."""
+
+    def __init__(self, what: str):
+        self.what = what
+        self.failing = False
+
+    def failed(self, exc: Exception):
+        if not self.failing:
+            self.failing = True
+            log.warning("%s failed, retrying in the background: %s", self.what, exc, exc_info=exc)
+
+    def ok(self):
+        if self.failing:
+            self.failing = False
+            log.warning("%s recovered", self.what)
+
+
+class MemorySessionStore:
+    """Prozesslokaler Speicher – Verhalten wie bisher, nur innerhalb eines Workers wiederherstellbar.
+
+    LRU mit Obergrenze `max_sessions`, damit getrennte Sessions den Worker nicht dauerhaft belegen.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MEMORY_MAX):
+        self.max_sessions = max_sessions
+        self._data = OrderedDict()  # sid ⇒ (letzter Zugriff, blob)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._data[key] = (time.time(), entry[1])
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def put_many(self, items: dict):
+        now = time.time()
+        with self._lock:
+            for key, blob in items.items():
+                self._data[key] = (now, blob)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def sweep(self, max_age_s: float):
+        cutoff = time.time() - max_age_s
+        with self._lock:
+            # älteste Einträge stehen vorne (LRU‑Reihenfolge)
+            while self._data and next(iter(self._data.values()))[0] < cutoff:
+                self._data.popitem(last=False)
+
+
+class FileSessionStore:
+    """Eine Datei pro Session in einem geteilten Verzeichnis; atomar ersetzt per os.replace.
+
+    Die mtime ist der letzte Zugriff (Schreiben oder Wiederherstellen); `sweep` löscht alte Dateien.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self._path, f"{key}.session")
+
+    def get(self, key: str):
+        try:
+            with open(self._file(key), "rb") as f:
+                blob = f.read()
+            os.utime(self._file(key))
+            return blob
+        except FileNotFoundError:
+            return None
+
+    def put_many(self, items: dict):
+        for key, blob in items.items():
+            tmp = f"{self._file(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self._file(key))
+
+    def sweep(self, max_age_s: float):
+        cutoff = time.time() - max_age_s
+        with os.scandir(self._path) as entries:
+            for entry in entries:
+                if not entry.name.endswith((".session", ".tmp")):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass  # parallel von einem anderen Worker entfernt
+
+
+class KVSessionStore:
+    """SQLite als lokaler Key‑Value‑Ersatz (statt z. B. Redis); sicher bei mehreren Prozessen."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, blob BLOB NOT NULL, updated REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "updated" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN updated REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT blob FROM sessions WHERE sid = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE sessions SET updated = ? WHERE sid = ?", (time.time(), key))
+        return bytes(row[0]) if row else None
+
+    def put_many(self, items: dict):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions (sid, blob, updated) VALUES (?, ?, ?)",
+                ((key, blob, now) for key, blob in items.items()),
+            )
+
+    def sweep(self, max_age_s: float):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - max_age_s,))
+
+
+class WriteBehindStore:
+    """Puffert Schreibzugriffe und schreibt sie gesammelt ins Backend.
+
+    Geflusht wird spätestens nach `max_delay_s` oder sobald `max_batch` Sessions offen sind;
+    Lesezugriffe sehen offene Änderungen sofort. Schlägt ein Flush fehl, bleibt der Batch
+    gepuffert (neuere Stände haben Vorrang) und wird beim nächsten Durchlauf erneut versucht.
+    Alle `sweep_every_s` entfernt das Backend Sessions, die älter als `ttl_s` sind.
+    """
+
+    def __init__(self, backend, max_batch: int = 64, max_delay_s: float = 0.5,
+                 ttl_s: float = SESSION_TTL_S, sweep_every_s: float = 600.0):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self.ttl_s = ttl_s
+        self.sweep_every_s = sweep_every_s
+        self._next_sweep = time.time()
+        self._failures = _FailureLatch("Session flush")
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, name="session-write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+        return self.backend.get(key)
+
+    def put(self, key: str, blob: bytes):
+        with self._lock:
+            self._pending[key] = blob
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        try:
+            self.backend.put_many(batch)
+        except Exception:
+            with self._lock:
+                self._pending = {**batch, **self._pending}
+            raise
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.max_delay_s)
+            self._wake.clear()
+            self._tick()
+
+    def _tick(self):
+        """Ein Durchlauf des Hintergrund‑Threads: Flush, gelegentlich Sweep; Fehler nur beim Zustandswechsel loggen."""
+        try:
+            self.flush()
+            if time.time() >= self._next_sweep:
+                self._next_sweep = time.time() + self.sweep_every_s
+                self.backend.sweep(self.ttl_s)
+        except Exception as e:
+            self._failures.failed(e)
+        else:
+            self._failures.ok()
+
+
+def make_session_store(backend: str = SESSION_BACKEND, path: str = SESSION_PATH):
+    if backend == "file":
+        inner = FileSessionStore(path)
+    elif backend == "kv":
+        inner = KVSessionStore(os.path.join(path, "sessions.sqlite3"))
+    elif backend == "memory":
+        inner = MemorySessionStore()
+    else:
+        raise ValueError(f"Unknown session backend: {backend!r} (expected memory, file or kv)")
+    return WriteBehindStore(inner)
+
+
+@st.cache_resource
+def get_session_store():
+    """Ein Store pro Worker‑Prozess, geteilt von allen Sessions."""
+    return make_session_store()
+
+
+def dump_session_state(state) -> bytes:
+    """Kompakte, versionierte Serialisierung: 1 Byte Version + zlib(JSON)."""
+    flour = state.get("flour")
+    eater_df = state.eater_df
+    payload = {
+        "recipe": asdict(state.recipe),
+        "eaters": [[str(n), float(f)] for n, f in zip(eater_df["name"], eater_df["factor"])],
+        "lang": state.lang,
+        "theme": state.theme,
+        "expert": bool(state.expert),
+        "last_lang": state.get("_last_lang"),
+        "flour": asdict(flour) if flour is not None else None,
+    }
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return bytes([SESSION_FORMAT_VERSION]) + zlib.compress(raw)
+
+
+def load_session_state(blob: bytes, state) -> bool:
+    """Stellt den Zustand aus `dump_session_state` wieder her; False bei fehlenden/fremden Daten."""
+    if not blob or blob[0] != SESSION_FORMAT_VERSION:
+        return False
+    try:
+        payload = json.loads(zlib.decompress(blob[1:]))
+    except (zlib.error, ValueError):
+        return False
+    state.recipe = Recipe(**{**asdict(Recipe()), **payload.get("recipe", {})})
+    state.eater_df = pd.DataFrame(payload.get("eaters", []), columns=["name", "factor"])
+    state.lang = payload.get("lang") or "de"
+    state.theme = payload.get("theme") or "light"
+    state.expert = bool(payload.get("expert", False))
+    if payload.get("last_lang"):
+        state._last_lang = payload["last_lang"]
+    state.flour = Flour(**payload["flour"]) if payload.get("flour") else None
+    return True
+
+
+def _session_id() -> str:
+    """Session‑ID aus der URL (?sid=…), damit jeder Worker ein Tablet nach Reconnect wiedererkennt."""
+    sid = st.query_params.get("sid")
+    if not sid or not _SID_RE.fullmatch(sid):
+        sid = uuid.uuid4().hex
+        st.query_params["sid"] = sid
+    return sid
+
+
+def _restore_session_state():
+    blob = get_session_store().get(_session_id())
+    if load_session_state(blob, st.session_state):
+        st.session_state._persisted_blob = blob
+
+
+def _persist_session_state():
+    blob = dump_session_state(st.session_state)
+    if blob != st.session_state.get("_persisted_blob"):
+        get_session_store().put(_session_id(), blob)
+        st.session_state._persisted_blob = blob
 
 
 def init_state():
+    if "recipe" not in st.session_state and _has_ctx():
+        _restore_session_state()
     if "recipe" not in st.session_state:
         st.session_state.recipe = Recipe()
     if "eater_df" not in st.session_state:
@@ -219,12 +769,17 @@ def init_state():
         st.session_state.theme = "light"
     if "expert" not in st.session_state:
         st.session_state.expert = False
+    if "flour" not in st.session_state:
+        st.session_state.flour = None
         
 # --- Localization helper for eater names (only known defaults) ---
+EATER_NAMES_DE_TO_EN = {"Wenig-Esser": "Weak-Eater", "Normal-Esser": "Normal-Eater", "Viel-Esser": "Heavy-Eater"}
+
+
 def _localize_eater_names_to(lang: str):
     if "eater_df" not in st.session_state:
         return
-    mapping_de_to_en = {"Wenig-Esser": "Weak-Eater", "Normal-Esser": "Normal-Eater", "Viel-Esser": "Heavy-Eater"}
+    mapping_de_to_en = EATER_NAMES_DE_TO_EN
     mapping_en_to_de = {v: k for k, v in mapping_de_to_en.items()}
     df = st.session_state.eater_df.copy()
     if "name" in df.columns:
@@ -551,6 +1106,9 @@ with st.sidebar.expander("🧩 Config"):
         eaters = data.get("eaters")
         if eaters:
             st.session_state.eater_df = pd.DataFrame(eaters)
+        # Load flour (optional)
+        if data.get("flour"):
+            st.session_state.flour = Flour(**data["flour"])
         st.rerun()
 
     export_payload = {
@@ -558,10 +1116,12 @@ with st.sidebar.expander("🧩 Config"):
         "eaters": st.session_state.eater_df.to_dict(orient="records"),
         "lang": st.session_state.lang,
         "theme": st.session_state.theme,
+        "flour": asdict(st.session_state.flour) if st.session_state.flour is not None else None,
     }
     st.download_button(T("export"), data=json.dumps(export_payload, indent=2), file_name="pizza_cfg.json", mime="application/json")
 
 # Expert editors
+preferment_note = None
 if st.session_state.expert:
     with st.sidebar.expander("👥 " + T("eaters"), expanded=False):
         st.caption(T("eaters_caption"))
@@ -665,46 +1225,863 @@ if st.session_state.expert:
         r.yeast_per_kg = st.number_input(T("yeast_per_kg"), min_value=0.0, max_value=50.0, value=float(r.yeast_per_kg), step=0.5)
         r.salt_per_kg = st.number_input(T("salt_per_kg"), min_value=0.0, max_value=80.0, value=float(r.salt_per_kg), step=0.5)
         r.normal_pizza_g = st.number_input(T("normal_weight"), min_value=100.0, max_value=600.0, value=float(r.normal_pizza_g), step=5.0)
+        r.oil_per_kg = st.number_input(T("oil_per_kg"), min_value=0.0, max_value=100.0, value=float(r.oil_per_kg), step=1.0)
+        r.sugar_per_kg = st.number_input(T("sugar_per_kg"), min_value=0.0, max_value=50.0, value=float(r.sugar_per_kg), step=0.5)
+        r.malt_per_kg = st.number_input(T("malt_per_kg"), min_value=0.0, max_value=20.0, value=float(r.malt_per_kg), step=0.5)
+        preferment_options = ["none", *PREFERMENTS]
+        r.preferment = st.selectbox(
+            T("preferment"),
+            options=preferment_options,
+            index=preferment_options.index(r.preferment) if r.preferment in preferment_options else 0,
+            format_func=T,
+        )
+        if r.preferment != "none":
+            # Vorteig ohne Mehlanteil wäre stillschweigend eine direkte Führung ⇒ typischer Startwert
+            share = int(r.preferment_flour_pct) or PREFERMENT_DEFAULT_PCT[r.preferment]
+            r.preferment_flour_pct = st.slider(T("preferment_flour_pct"), min_value=5, max_value=100, value=share, step=5)
+        else:
+            r.preferment_flour_pct = 0.0
+        preferment_note = st.empty()  # Hinweis, falls die Hydration (weiter unten gewählt) den Anteil begrenzt
         st.session_state.recipe = r
 
 # ---------- Helpers ----------
-def compute_requirements(eaters_selection: dict, hydration_pct: int, gabriel_on: bool, recipe: Recipe):
+_EPS = 1e-9  # Toleranz für Gleitkomma‑Grenzen (Vorteig‑Anteil, Umkehrrechnung)
+
+
+def effective_pizzas_per_kg(recipe: Recipe, flour: Flour = None) -> float:
+    """Standard‑Pizzen pro kg Mehl, ggf. um die Ausbeute des gewählten Mehls korrigiert."""
+    return recipe.pizzas_per_kg * (flour.yield_factor if flour is not None else 1.0)
+
+
+def recommended_hydration(flour: Flour = None) -> int:
+    """Empfohlene Hydration des Mehls, auf die 5 %-Stufen des Sliders gerundet (Default 60 %)."""
+    if flour is None:
+        return 60
+    return int(min(HYDRATION_MAX, max(HYDRATION_MIN, 5 * round(flour.hydration_pct / 5))))
+
+
+def max_preferment_flour_pct(preferment: str, hydration_pct: float) -> float:
+    """Größter Mehlanteil im Vorteig (%), dessen Wasser die Gesamt‑Hydration noch hergibt."""
+    if preferment not in PREFERMENTS:
+        return 100.0
+    return min(100.0, hydration_pct / PREFERMENTS[preferment])
+
+
+@lru_cache(maxsize=256)
+def _stage_percentages(hydration_pct: float, yeast: float, salt: float, oil: float, sugar: float, malt: float,
+                       preferment: str, preferment_flour_pct: float):
+    vector = np.array([1.0, hydration_pct / 100.0, yeast, salt, oil, sugar, malt]) / [1, 1, 1000, 1000, 1000, 1000, 1000]
+    share = min(max(preferment_flour_pct, 0.0), 100.0) / 100.0
+    if preferment not in PREFERMENTS or share == 0.0:
+        stages = ("main",)
+        split = np.ones((1, len(INGREDIENTS)))
+    else:
+        if share * 100.0 > max_preferment_flour_pct(preferment, hydration_pct) + _EPS:
+            raise ValueError(
+                f"{preferment} with {share:.0%} of the flour needs more water than {hydration_pct:g}% hydration"
+            )
+        # Anteil jeder Gesamt‑Zutat, der in den Vorteig wandert; der Rest kommt in den Hauptteig
+        water_share = share * PREFERMENTS[preferment] / vector[1]
+        pre = np.array([share, water_share, 1.0, 0.0, 0.0, 0.0, 0.0])
+        stages = (preferment, "main")
+        split = np.vstack([pre, 1.0 - pre])
+    matrix = split * vector
+    matrix.setflags(write=False)
+    return stages, matrix
+
+
+def stage_percentages(recipe: Recipe, hydration_pct: float):
+    """(Stufen, Matrix Stufen × INGREDIENTS) in Bäckerprozenten.
+
+    Der lru_cache lebt nur einen Skriptlauf (Streamlit führt app.py bei jedem Rerun neu aus);
+    er spart die Matrix für viele Rechnungen mit demselben Rezept, z. B. alle Karten eines Batches.
+    """
+    return _stage_percentages(
+        float(hydration_pct), recipe.yeast_per_kg, recipe.salt_per_kg, recipe.oil_per_kg, recipe.sugar_per_kg,
+        recipe.malt_per_kg, recipe.preferment, recipe.preferment_flour_pct,
+    )
+
+
+def stage_quantities(flour_g, recipe: Recipe, hydration_pct: float):
+    """Gramm je Stufe und Zutat für eine oder viele Mehlmengen: Form (*flour_g.shape, Stufen, Zutaten)."""
+    stages, matrix = stage_percentages(recipe, hydration_pct)
+    return stages, np.multiply.outer(np.asarray(flour_g, dtype=float), matrix)
+
+
+def compute_requirements(eaters_selection: dict, hydration_pct: int, gabriel_on: bool, recipe: Recipe, flour: Flour = None):
     """Berechnet Zutaten und Pizza-Anzahl.
 
     - Bedarf in "Standard‑Pizzen" = Summe(count * factor)
     - Ohne Gabriel: Auf ganze Pizzen aufrunden ⇒ evtl. Reste
     - Mit Gabriel: exakt benötigte Menge ⇒ keine Reste
-    - Zutaten linear zur Mehlmenge (Hefe/Salz pro 1 kg Mehl)
+    - Zutaten linear zur Mehlmenge: ein Multiply über den Bäckerprozent‑Vektor, aufgeteilt nach Stufen (Vorteig/Hauptteig)
+    - Optional: Mehl aus dem Katalog passt Ausbeute (Pizzen/kg) und Hydrations‑Empfehlung an
     """
     need_equiv_pizzas = sum(count * factor for factor, count in eaters_selection.values())
 
     # Always make whole pizzas; Gabriel only affects leftovers (he eats them)
     pizzas_to_make = math.ceil(need_equiv_pizzas)
 
-    # Mehl-Basis: 1 kg Mehl ⇒ recipe.pizzas_per_kg Standard‑Pizzen ⇒ pro Pizza 1000/recipe.pizzas_per_kg g Mehl
-    flour_per_pizza_g = 1000.0 / recipe.pizzas_per_kg
+    # Mehl-Basis: 1 kg Mehl ⇒ pizzas_per_kg Standard‑Pizzen ⇒ pro Pizza 1000/pizzas_per_kg g Mehl
+    flour_per_pizza_g = 1000.0 / effective_pizzas_per_kg(recipe, flour)
     total_flour_g = flour_per_pizza_g * pizzas_to_make
 
-    hydration = hydration_pct / 100.0
-    total_water_g = total_flour_g * hydration
-
-    total_yeast_g = recipe.yeast_per_kg * (total_flour_g / 1000.0)
-    total_salt_g = recipe.salt_per_kg * (total_flour_g / 1000.0)
+    stages, quantities = stage_quantities(total_flour_g, recipe, hydration_pct)
+    totals = quantities.sum(axis=0).tolist()
+    flour_g, water_g, yeast_g, salt_g, oil_g, sugar_g, malt_g = totals
 
     leftover_pizzas = 0.0 if gabriel_on else (pizzas_to_make - need_equiv_pizzas)
 
-    total_dough_g = total_flour_g + total_water_g + total_yeast_g + total_salt_g
-
     return {
         "need_equiv_pizzas": need_equiv_pizzas,
         "pizzas_to_make": pizzas_to_make,
         "leftover_pizzas": leftover_pizzas,
-        "flour_g": total_flour_g,
-        "water_ml": total_water_g,
-        "yeast_g": total_yeast_g,
-        "salt_g": total_salt_g,
-        "dough_g": total_dough_g,
+        "flour_g": flour_g,
+        "water_ml": water_g,
+        "yeast_g": yeast_g,
+        "salt_g": salt_g,
+        "oil_g": oil_g,
+        "sugar_g": sugar_g,
+        "malt_g": malt_g,
+        "dough_g": sum(totals),
+        "stages": {stage: dict(zip(INGREDIENTS, row)) for stage, row in zip(stages, quantities.tolist())},
+        "recommended_hydration_pct": recommended_hydration(flour),
+    }
+
+# ---------- Umkehrrechnung (Vorrat ⇒ Gäste) ----------
+INVENTORY_COLUMNS = ("flour_g", "water_ml", "yeast_g", "salt_g")
+# Ergebnisse je Esser‑Typ mit eigenem Präfix, damit kein Name (z. B. "pizzas") feste Spalten überschreibt
+GUESTS_MAX_PREFIX = "guests_max::"
+GUESTS_MIX_PREFIX = "guests_mix::"
+
+
+def _max_count(max_pizzas: np.ndarray, need_fn, upper: np.ndarray) -> np.ndarray:
+    """Größtes n ≤ upper mit ceil(need_fn(n)) ≤ max_pizzas – exakt wie die Rundung in compute_requirements."""
+    n = np.floor(upper + _EPS)
+    too_many = np.ceil(need_fn(n)) > max_pizzas
+    return np.where(too_many, n - 1, n)
+
+
+def solve_max_guests(inventory: pd.DataFrame, hydration_pct: int, recipe: Recipe, eater_factors: dict,
+                     mix: dict = None, flour: Flour = None) -> pd.DataFrame:
+    """Umkehrung von compute_requirements für eine ganze Vorratstabelle (eine Zeile pro Standort).
+
+    - Spalten aus INVENTORY_COLUMNS; fehlende Spalten gelten als unbegrenzt, leere Zellen als 0
+    - max_pizzas = kleinste Anzahl ganzer Pizzen, die eine Zutat noch erlaubt ⇒ `limiting`
+    - guests_max::<Esser> = maximale Gäste, wenn nur dieser Esser‑Typ kommt
+    - Mit `mix` (Name ⇒ Anzahl): wie oft der Mix vollständig bedient werden kann ⇒ mix_units, guests_mix::<Esser>
+    """
+    _, per_stage = stage_quantities(1000.0 / effective_pizzas_per_kg(recipe, flour), recipe, hydration_pct)
+    per_pizza = dict(zip(("flour_g", "water_ml", "yeast_g", "salt_g"), per_stage.sum(axis=0)[:4]))
+    used = [c for c in INVENTORY_COLUMNS if c in inventory.columns and per_pizza[c] > 0]
+    if not used:
+        raise ValueError(f"inventory needs at least one of {INVENTORY_COLUMNS}")
+
+    out = pd.DataFrame(index=inventory.index)
+    stock = inventory[used].fillna(0.0).to_numpy(dtype=float)
+    pizzas_by = stock / np.array([per_pizza[c] for c in used])
+    max_pizzas = np.floor(np.maximum(pizzas_by.min(axis=1), 0.0) + _EPS)
+    out["max_pizzas"] = max_pizzas
+    out["limiting"] = np.array(used)[pizzas_by.argmin(axis=1)]
+
+    for name, factor in eater_factors.items():
+        if factor > 0:
+            out[GUESTS_MAX_PREFIX + name] = _max_count(max_pizzas, lambda n, f=factor: n * f, max_pizzas / factor).astype(int)
+
+    if mix:
+        mix = {name: count for name, count in mix.items() if count > 0 and eater_factors.get(name, 0) > 0}
+        per_unit = sum(count * eater_factors[name] for name, count in mix.items())
+        if per_unit > 0:
+            units = _max_count(
+                max_pizzas,
+                lambda k: sum((k * count) * eater_factors[name] for name, count in mix.items()),
+                max_pizzas / per_unit,
+            ).astype(int)
+            out["mix_units"] = units
+            for name, count in mix.items():
+                out[GUESTS_MIX_PREFIX + name] = units * count
+
+    out["max_pizzas"] = max_pizzas.astype(int)
+    return out
+
+# ---------- Berechnungs-Log (spaltenbasiert) ----------
+CALC_LOG_DIR = os.environ.get(
+    "PIZZA_CALC_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".calc_log")
+)
+# Reihenfolge = Zeilen der Segment‑Matrix; bei Änderungen CALC_LOG_VERSION erhöhen
+CALC_LOG_COLUMNS = (
+    "ts", "guests", "hydration_pct", "gabriel",
+    # Rezept (preferment als Index in PREFERMENT_CODES)
+    "pizzas_per_kg", "yeast_per_kg", "salt_per_kg", "normal_pizza_g", "oil_per_kg", "sugar_per_kg", "malt_per_kg",
+    "preferment", "preferment_flour_pct",
+    # Schlüssel in inputs.jsonl: Anzahl je Esser‑Typ (mit Faktor) und Mehl‑SKU
+    "inputs",
+    "need_equiv_pizzas", "pizzas_to_make", "leftover_pizzas",
+    "flour_g", "water_ml", "yeast_g", "salt_g", "oil_g", "sugar_g", "malt_g", "dough_g",
+)
+CALC_LOG_VERSION = 2
+PREFERMENT_CODES = ("none", *PREFERMENTS)
+
+
+def _inputs_key(payload: dict) -> int:
+    """Stabiler 53‑Bit‑Schlüssel (exakt als float64 speicherbar) für eine Eingabe‑Kombination."""
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big") >> 11
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exklusiver Lock über Prozesse hinweg (flock; unter Windows msvcrt)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class CalcLog:
+    """Append‑only Log aller Berechnungen.
+
+    Einträge landen zuerst in einem Puffer (ein Tupel pro Aufruf) und werden gesammelt als
+    Segment geschrieben: eine .npy‑Datei pro Segment, Form (Spalten × Zeilen), nach `ts`
+    sortiert – jede Spalte liegt damit zusammenhängend und wird per mmap gelesen.
+
+    Eingaben variabler Länge (Anzahl je Esser‑Typ, Mehl‑SKU) stehen einmal pro Kombination in
+    `inputs.jsonl`; die Spalte `inputs` verweist per Schlüssel darauf (siehe `query_inputs`).
+
+    `manifest-v<N>.json` listet die gültigen Segmente samt Zeilenzahl und ts‑Bereich; Abfragen
+    öffnen nur Segmente, die das Zeitfenster berühren. Sobald `compact_at` kleine Segmente
+    (< `segment_rows` Zeilen) vorliegen, werden sie zu einem großen sortierten Segment
+    zusammengeführt. Manifest‑Änderungen laufen unter einem Datei‑Lock, daher können mehrere
+    Worker in dasselbe Verzeichnis schreiben; höchstens `max_open` Segmente bleiben gemappt.
+    """
+
+    def __init__(self, path: str, flush_every: int = 4096, max_delay_s: float = 5.0,
+                 segment_rows: int = 250_000, compact_at: int = 16, max_open: int = 64):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self.max_delay_s = max_delay_s
+        self.segment_rows = segment_rows
+        self.compact_at = compact_at
+        self.max_open = max_open
+        self._manifest_path = os.path.join(path, f"manifest-v{CALC_LOG_VERSION}.json")
+        self._lock_path = os.path.join(path, ".manifest.lock")
+        self._inputs_path = os.path.join(path, "inputs.jsonl")
+        self._buffer = []
+        self._new_inputs = {}       # Schlüssel ⇒ Eingaben, noch nicht in inputs.jsonl
+        self._known_inputs = set()  # von diesem Prozess bereits vorgemerkte Schlüssel
+        self._inputs_cache = ({}, None)
+        self._lock = threading.Lock()       # Puffer
+        self._read_lock = threading.Lock()  # Manifest‑Cache und offene Segmente
+        self._wake = threading.Event()
+        self._segments = OrderedDict()  # Dateiname ⇒ mmap‑Array (LRU, höchstens max_open)
+        self._manifest = []             # [(Dateiname, Zeilen, ts_min, ts_max), …]
+        self._manifest_stat = None
+        self._seq = 0
+        self._failures = _FailureLatch("Calc log flush")
+        if not os.path.exists(self._manifest_path):
+            self._adopt_existing_segments()
+        threading.Thread(target=self._run, name="calc-log-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    def append(self, hydration_pct: int, gabriel_on: bool, eaters_selection: dict, res: dict, recipe: Recipe,
+               flour: Flour = None, ts: float = None):
+        """Nur ein Tupel anhängen – Schreiben passiert gebündelt außerhalb des Rerun‑Pfads.
+
+        `eaters_selection` wie bei compute_requirements: Name ⇒ (Faktor, Anzahl).
+        """
+        inputs = {
+            "eaters": {str(name): [factor, count] for name, (factor, count) in eaters_selection.items()},
+            "flour": flour.sku if flour is not None else None,
+        }
+        key = _inputs_key(inputs)
+        row = (
+            time.time() if ts is None else ts, sum(c for _, c in eaters_selection.values()), hydration_pct, gabriel_on,
+            recipe.pizzas_per_kg, recipe.yeast_per_kg, recipe.salt_per_kg, recipe.normal_pizza_g,
+            recipe.oil_per_kg, recipe.sugar_per_kg, recipe.malt_per_kg,
+            PREFERMENT_CODES.index(recipe.preferment) if recipe.preferment in PREFERMENT_CODES else 0,
+            recipe.preferment_flour_pct, key,
+            res["need_equiv_pizzas"], res["pizzas_to_make"], res["leftover_pizzas"],
+            res["flour_g"], res["water_ml"], res["yeast_g"], res["salt_g"],
+            res["oil_g"], res["sugar_g"], res["malt_g"], res["dough_g"],
+        )
+        with self._lock:
+            self._buffer.append(row)
+            if key not in self._known_inputs:
+                self._known_inputs.add(key)
+                self._new_inputs[key] = inputs
+            full = len(self._buffer) >= self.flush_every
+        if full:
+            self._wake.set()
+
+    # --- Manifest ---
+    def _read_manifest(self) -> list:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return [tuple(e) for e in json.load(f)["segments"]]
+        except FileNotFoundError:
+            return []
+
+    def _write_manifest(self, entries: list):
+        tmp = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CALC_LOG_VERSION, "segments": entries}, f, separators=(",", ":"))
+        os.replace(tmp, self._manifest_path)
+
+    def _adopt_existing_segments(self):
+        """Segmente aus der Zeit vor dem Manifest einmalig aufnehmen."""
+        with _file_lock(self._lock_path):
+            if os.path.exists(self._manifest_path):
+                return
+            entries = []
+            prefix = f"seg-v{CALC_LOG_VERSION}-"
+            for name in sorted(n for n in os.listdir(self.path) if n.startswith(prefix) and n.endswith(".npy")):
+                ts = np.load(os.path.join(self.path, name), mmap_mode="r")[0]
+                if len(ts):
+                    entries.append((name, len(ts), float(ts[0]), float(ts[-1])))
+            self._write_manifest(entries)
+
+    def _write_segment(self, block: np.ndarray, tag: str) -> tuple:
+        name = f"seg-v{CALC_LOG_VERSION}-{time.time_ns():020d}-{os.getpid()}-{tag}.npy"
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.save(f, block)
+            os.replace(tmp, os.path.join(self.path, name))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return (name, block.shape[1], float(block[0, 0]), float(block[0, -1]))
+
+    def _append_inputs(self, inputs: dict):
+        """Neue Eingabe‑Kombinationen anhängen (eine JSON‑Zeile je Schlüssel; Duplikate anderer Worker sind harmlos)."""
+        lines = "".join(
+            json.dumps({"key": key, **payload}, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for key, payload in inputs.items()
+        )
+        with open(self._inputs_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def flush(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            new_inputs, self._new_inputs = self._new_inputs, {}
+            self._seq += 1
+            seq = self._seq
+        block = np.array(rows, dtype=np.float64).T
+        block = np.ascontiguousarray(block[:, np.argsort(block[0], kind="stable")])
+        try:
+            entry = self._write_segment(block, str(seq))
+            with _file_lock(self._lock_path):
+                if new_inputs:
+                    self._append_inputs(new_inputs)  # vor dem Segment‑Eintrag ⇒ jeder Schlüssel ist auflösbar
+                    new_inputs = {}
+                entries = self._read_manifest() + [entry]
+                self._write_manifest(entries)
+        except Exception:
+            # Zeilen behalten und später erneut versuchen; bei Dauerfehler nur die neuesten behalten
+            # (ein bereits geschriebenes, aber nicht eingetragenes Segment wird nie gelesen)
+            with self._lock:
+                self._buffer = (rows + self._buffer)[-10 * self.flush_every:]
+                self._new_inputs = {**new_inputs, **self._new_inputs}
+            raise
+        if sum(1 for e in entries if e[1] < self.segment_rows) >= self.compact_at:
+            self.compact()
+
+    def compact(self):
+        """Kleine Segmente zu einem großen, nach ts sortierten Segment zusammenführen."""
+        with _file_lock(self._lock_path):
+            entries = self._read_manifest()
+            # kleinste zuerst, bis ein volles Segment erreicht ist ⇒ Speicherbedarf bleibt begrenzt
+            small, rows = [], 0
+            for e in sorted((e for e in entries if e[1] < self.segment_rows), key=lambda e: e[1]):
+                if rows >= self.segment_rows:
+                    break
+                small.append(e)
+                rows += e[1]
+            self._remove_orphans({e[0] for e in entries})
+            if len(small) < 2:
+                return
+            block = np.concatenate([np.load(os.path.join(self.path, e[0])) for e in small], axis=1)
+            block = np.ascontiguousarray(block[:, np.argsort(block[0], kind="stable")])
+            merged = self._write_segment(block, "c")
+            small_names = {e[0] for e in small}
+            self._write_manifest([e for e in entries if e[0] not in small_names] + [merged])
+            # Alte Segmente erst nach dem Manifest‑Wechsel löschen; offene mmaps bleiben gültig
+            for name in small_names:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+
+    def _remove_orphans(self, live: set, min_age_s: float = 3600.0):
+        """Segmente ohne Manifest‑Eintrag (z. B. nach fehlgeschlagenem Flush) aufräumen."""
+        cutoff = time.time() - min_age_s
+        prefix = f"seg-v{CALC_LOG_VERSION}-"
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.startswith(prefix) and entry.name not in live:
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.max_delay_s)
+            self._wake.clear()
+            self._tick()
+
+    def _tick(self):
+        """Ein Durchlauf des Hintergrund‑Threads; Fehler nur beim Zustandswechsel loggen."""
+        try:
+            self.flush()
+        except Exception as e:
+            self._failures.failed(e)
+        else:
+            self._failures.ok()
+
+    # --- Lesen ---
+    def _refresh_manifest(self, force: bool = False):
+        try:
+            st_ = os.stat(self._manifest_path)
+            key = (st_.st_ino, st_.st_mtime_ns, st_.st_size)
+        except FileNotFoundError:
+            key = None
+        if force or key != self._manifest_stat:
+            self._manifest = self._read_manifest()
+            self._manifest_stat = key
+            live = {e[0] for e in self._manifest}
+            for name in [n for n in self._segments if n not in live]:
+                del self._segments[name]
+
+    def _open(self, name: str) -> np.ndarray:
+        block = self._segments.get(name)
+        if block is None:
+            block = np.load(os.path.join(self.path, name), mmap_mode="r")
+            self._segments[name] = block
+            while len(self._segments) > self.max_open:
+                self._segments.popitem(last=False)
+        else:
+            self._segments.move_to_end(name)
+        return block
+
+    def _blocks(self, start: float = None, end: float = None) -> list:
+        """Gemappte Segmente (plus Puffer), deren ts‑Bereich das Fenster [start, end) berührt."""
+        for attempt in range(3):
+            with self._read_lock:
+                self._refresh_manifest(force=attempt > 0)
+                try:
+                    blocks = [
+                        self._open(name) for name, _, ts_min, ts_max in self._manifest
+                        if (start is None or ts_max >= start) and (end is None or ts_min < end)
+                    ]
+                    break
+                except FileNotFoundError:
+                    continue  # parallel kompaktiert ⇒ Manifest neu lesen
+        else:
+            raise RuntimeError("calc log segments changed during read")
+        with self._lock:
+            pending = list(self._buffer)
+        if pending:
+            block = np.array(pending, dtype=np.float64).T
+            blocks.append(block[:, np.argsort(block[0], kind="stable")])
+        return blocks
+
+    def _windows(self, start: float = None, end: float = None):
+        """Je Segment der Ausschnitt [start, end) – per Binärsuche auf der sortierten ts‑Spalte."""
+        for block in self._blocks(start, end):
+            ts = block[0]
+            if not len(ts) or (start is not None and ts[-1] < start) or (end is not None and ts[0] >= end):
+                continue
+            lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+            hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="left"))
+            if hi > lo:
+                yield block[:, lo:hi]
+
+    def query(self, columns=CALC_LOG_COLUMNS, start: float = None, end: float = None) -> pd.DataFrame:
+        """Rohdaten im Zeitfenster [start, end) (Unix‑Sekunden) als DataFrame."""
+        idx = [CALC_LOG_COLUMNS.index(c) for c in columns]
+        parts = [w[idx] for w in self._windows(start, end)]
+        data = np.concatenate(parts, axis=1) if parts else np.empty((len(idx), 0))
+        return pd.DataFrame(dict(zip(columns, data)))
+
+    def inputs(self) -> dict:
+        """Schlüssel ⇒ Eingaben ({"eaters": {Name: [Faktor, Anzahl]}, "flour": SKU}) aus inputs.jsonl (plus Puffer)."""
+        try:
+            st_ = os.stat(self._inputs_path)
+            stamp = (st_.st_ino, st_.st_size)
+        except FileNotFoundError:
+            stamp = None
+        cached, cached_stamp = self._inputs_cache
+        if stamp != cached_stamp:
+            cached = {}
+            if stamp is not None:
+                with open(self._inputs_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # abgeschnittene letzte Zeile eines parallelen Schreibers
+                        cached[entry.pop("key")] = entry
+            self._inputs_cache = (cached, stamp)
+        with self._lock:
+            pending = dict(self._new_inputs)
+        return {**cached, **pending}
+
+    def query_inputs(self, start: float = None, end: float = None) -> pd.DataFrame:
+        """Eingaben je Berechnung im Zeitfenster: ts, flour_sku und eine Spalte Anzahl je Esser‑Typ."""
+        df = self.query(("ts", "inputs"), start, end)
+        payloads = self.inputs()
+        rows = [payloads.get(int(k), {}) for k in df["inputs"]]
+        counts = pd.DataFrame(
+            [{name: count for name, (_, count) in p.get("eaters", {}).items()} for p in rows], index=df.index
+        )
+        flour_sku = pd.Series([p.get("flour") for p in rows], index=df.index, name="flour_sku")
+        return pd.concat([df[["ts"]], flour_sku, counts.fillna(0).astype(int)], axis=1)
+
+    def aggregate(self, column: str, how: str = "mean", start: float = None, end: float = None, freq: str = None):
+        """Aggregat einer Spalte im Zeitfenster: how ∈ count/sum/mean/min/max.
+
+        Ohne `freq` wird segmentweise direkt auf den gemappten Spalten gerechnet (kein Kopieren);
+        mit `freq` (numpy‑Zeiteinheit wie "D", "W", "M", "Y") kommt eine Zeitreihe pro Periode zurück.
+        """
+        if how not in ("count", "sum", "mean", "min", "max"):
+            raise ValueError(f"Unknown aggregate: {how!r}")
+        col = CALC_LOG_COLUMNS.index(column)
+        if freq is not None:
+            periods, values = [], []
+            for w in self._windows(start, end):
+                periods.append(w[0].astype("datetime64[s]").astype(f"datetime64[{freq}]"))
+                values.append(w[col])
+            if not periods:
+                return pd.Series(dtype=float, name=column)
+            series = pd.Series(np.concatenate(values), name=column)
+            return getattr(series.groupby(np.concatenate(periods).astype("datetime64[s]")), how)()
+        count, total, lo, hi = 0, 0.0, math.inf, -math.inf
+        for w in self._windows(start, end):
+            values = w[col]
+            count += len(values)
+            total += float(values.sum())
+            lo, hi = min(lo, float(values.min())), max(hi, float(values.max()))
+        if how == "count":
+            return count
+        if count == 0:
+            return math.nan
+        return {"sum": total, "mean": total / count, "min": lo, "max": hi}[how]
+
+
+class NullCalcLog(CalcLog):
+    """Ersatz, wenn das Log‑Verzeichnis nicht angelegt werden kann: nimmt alles an, speichert nichts."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+
+    def append(self, *args, **kwargs):
+        pass
+
+    def flush(self):
+        pass
+
+    def compact(self):
+        pass
+
+    def _blocks(self, start: float = None, end: float = None) -> list:
+        return []
+
+    def inputs(self) -> dict:
+        return {}
+
+
+@st.cache_resource
+def get_calc_log():
+    """Ein Log pro Worker‑Prozess; alle Sessions teilen sich Puffer und Segmente.
+
+    Ist das Verzeichnis nicht nutzbar, wird einmal gewarnt und nichts geloggt – die App läuft weiter.
+    """
+    try:
+        return CalcLog(CALC_LOG_DIR)
+    except (OSError, ValueError) as e:
+        log.warning("Calc log %s unavailable, calculations are not logged: %s", CALC_LOG_DIR, e)
+        return NullCalcLog(CALC_LOG_DIR)
+
+# ---------- Rezeptkarten (Batch) ----------
+# Templates werden pro Skriptlauf einmal erstellt (nicht über Reruns hinweg) und für jede Karte eines Batches wiederverwendet.
+CARD_DOC_HEAD = Template("""<!DOCTYPE html>
+<html lang="$lang"><head><meta charset="utf-8"><title>$title</title>
+<style>
+body { font-family: system-ui, sans-serif; color: #0b0f14; margin: 0; }
+.card { page-break-after: always; break-after: page; padding: 1.2cm; }
+.card h2 { margin: 0 0 .2rem 0; color: #ff4b4b; }
+.card table { border-collapse: collapse; width: 100%; margin: .6rem 0; }
+.card td { border-bottom: 1px solid rgba(0,0,0,.08); padding: .3rem .4rem; }
+.card td.v { text-align: right; font-weight: 600; }
+.card .hint { color: #6b7280; font-size: .9rem; }
+.card .prep { margin-top: .8rem; line-height: 1.4; }
+</style></head><body>
+""")
+CARD_DOC_TAIL = "</body></html>\n"
+CARD_TEMPLATE = Template("""<section class="card">
+<h2>$event</h2>
+<table>
+<tr><td>$l_need</td><td class="v">$need</td></tr>
+<tr><td>$l_make</td><td class="v">$make</td></tr>
+<tr><td>$l_left</td><td class="v">$left</td></tr>
+<tr><td>$l_hyd</td><td class="v">$hydration %</td></tr>
+<tr><td>$l_flour</td><td class="v">$flour g</td></tr>
+<tr><td>$l_water</td><td class="v">$water ml</td></tr>
+<tr><td>$l_yeast</td><td class="v">$yeast g</td></tr>
+<tr><td>$l_salt</td><td class="v">$salt g</td></tr>
+$extra_rows</table>
+<div class="hint">$hint</div>
+<h3>$l_prep</h3>
+<div class="prep">$prep</div>
+</section>
+""")
+
+# Core-Fonts im PDF sind Latin‑1: typografische Zeichen vorher ersetzen
+_PDF_CHARMAP = str.maketrans({"‑": "-", "–": "-", "—": "-", "≈": "~", "•": "-", "⇒": "=>", "🍕": ""})
+
+
+def _card_labels(lang: str) -> dict:
+    """Sprachabhängige Beschriftungen einmal pro Batch auflösen (nicht pro Karte)."""
+    s = STRINGS.get(lang, STRINGS["de"])
+    return {
+        "l_need": s["need_pizzas"],
+        "l_make": s["make_pizzas"],
+        "l_left": s["leftovers"],
+        "l_hyd": s["hydration_metric"],
+        "l_flour": s["flour"],
+        "l_water": s["water"],
+        "l_yeast": s["yeast"],
+        "l_salt": s["salt"],
+        "l_prep": s["prep_title"],
+        "prep": s["prep_text"],
+    }
+
+
+def _card_values(scenario: dict, recipe: Recipe, lang: str, flour: Flour = None) -> dict:
+    """Formatierte Kennzahlen einer Karte (gleiche Rundung wie die Metriken in der App)."""
+    res = compute_requirements(
+        eaters_selection=scenario["eaters"],
+        hydration_pct=scenario["hydration"],
+        gabriel_on=scenario["gabriel"],
+        recipe=recipe,
+        flour=flour,
+    )
+    s = STRINGS.get(lang, STRINGS["de"])
+    hint = s["teig_hint"].format(dough=f"{res['dough_g']:.0f}", std=f"{recipe.normal_pizza_g:.1f}")
+    # Zusatzzeilen: weitere Zutaten (nur wenn verwendet) und Vorteig/Hauptteig getrennt
+    extras = [(s[k], f"{res[f'{k}_g']:.1f} g") for k in ("oil", "sugar", "malt") if res[f"{k}_g"] > 0]
+    if len(res["stages"]) > 1:
+        for stage, q in res["stages"].items():
+            extras.append((
+                s.get(stage, stage),
+                f"{s['flour']} {q['flour']:.0f} g • {s['water']} {q['water']:.0f} ml • {s['yeast']} {q['yeast']:.1f} g",
+            ))
+    return {
+        "extras": extras,
+        "event": scenario["event"],
+        "need": f"{res['need_equiv_pizzas']:.2f}",
+        "make": f"{int(res['pizzas_to_make'])}",
+        "left": f"{res['leftover_pizzas']:.2f}",
+        "hydration": f"{scenario['hydration']}",
+        "flour": f"{res['flour_g']:.0f}",
+        "water": f"{res['water_ml']:.0f}",
+        "yeast": f"{res['yeast_g']:.1f}",
+        "salt": f"{res['salt_g']:.1f}",
+        "hint": hint,
+    }
+
+
+_TRUE_WORDS = ("1", "true", "yes", "ja", "x")
+_FALSE_WORDS = ("0", "false", "no", "nein", "")
+
+
+def _event_columns(columns, eater_names) -> tuple:
+    """Ordnet CSV‑Spalten den Esser‑Typen zu (auch DE/EN‑Standardnamen, z. B. nach Sprachwechsel).
+
+    Liefert (Spalte ⇒ Esser‑Name, nicht zuordenbare Spalten).
+    """
+    aliases = {**EATER_NAMES_DE_TO_EN, **{en: de for de, en in EATER_NAMES_DE_TO_EN.items()}}
+    mapping, unmatched = {}, []
+    for col in columns:
+        col = str(col)
+        if col in eater_names:
+            mapping[col] = col
+        elif aliases.get(col) in eater_names:
+            mapping[col] = aliases[col]
+        elif col not in ("event", "hydration", "gabriel"):
+            unmatched.append(col)
+    return mapping, unmatched
+
+
+def _parse_event_row(row: dict, mapping: dict, factors: dict, default_hydration: int):
+    """Eine CSV‑Zeile ⇒ (Szenario ohne Namen, Liste ungültiger (Spalte, Wert))."""
+    bad = []
+    hydration = row.get("hydration", default_hydration)
+    try:
+        hydration = float(hydration)
+        if not HYDRATION_MIN <= hydration <= HYDRATION_MAX:
+            raise ValueError
+        hydration = int(hydration) if hydration.is_integer() else hydration
+    except (TypeError, ValueError):
+        bad.append(("hydration", row.get("hydration")))
+
+    gabriel = row.get("gabriel", False)
+    if isinstance(gabriel, str):
+        word = gabriel.strip().lower()
+        if word not in _TRUE_WORDS + _FALSE_WORDS:
+            bad.append(("gabriel", gabriel))
+        gabriel = word in _TRUE_WORDS
+
+    counts = dict.fromkeys(factors, 0)
+    for col, name in mapping.items():
+        value = row.get(col, 0)
+        try:
+            count = float(value)
+            if count < 0 or not count.is_integer():
+                raise ValueError
+            counts[name] += int(count)
+        except (TypeError, ValueError):
+            bad.append((col, value))
+
+    scenario = {
+        "hydration": hydration,
+        "gabriel": bool(gabriel),
+        "eaters": {name: (f, counts[name]) for name, f in factors.items()},
     }
+    return scenario, bad
+
+
+def _iter_event_rows(df: pd.DataFrame, eater_df: pd.DataFrame, *, flour: Flour = None, recipe: Recipe = None):
+    factors = {str(r["name"]): float(r["factor"]) for _, r in eater_df.iterrows()}
+    mapping, _ = _event_columns(df.columns, factors)
+    default_hydration = recommended_hydration(flour)
+    for i, row in enumerate(df.to_dict(orient="records")):
+        row = {str(k): v for k, v in row.items() if not pd.isna(v)}  # leere CSV‑Zellen wie fehlende Spalten behandeln
+        scenario, bad = _parse_event_row(row, mapping, factors, default_hydration)
+        # Zu wenig Wasser für den Vorteig des Rezepts ⇒ Hydration der Zeile ist ungültig
+        if (recipe is not None and not any(col == "hydration" for col, _ in bad)
+                and recipe.preferment_flour_pct > max_preferment_flour_pct(recipe.preferment, scenario["hydration"]) + _EPS):
+            bad.append(("hydration", scenario["hydration"]))
+        scenario["event"] = str(row.get("event") or f"#{i + 1}")
+        yield i, scenario, bad
+
+
+def check_events_df(df: pd.DataFrame, eater_df: pd.DataFrame, *, flour: Flour = None, recipe: Recipe = None) -> tuple:
+    """Prüft eine Event‑Tabelle vor dem Rendern.
+
+    Liefert (nicht zuordenbare Spalten, ungültige Zellen als (CSV‑Zeile, Spalte, Wert)).
+    Mit `recipe` gilt auch eine Hydration als ungültig, die für dessen Vorteig zu niedrig ist.
+    """
+    _, unmatched = _event_columns(df.columns, {str(n) for n in eater_df["name"]})
+    rows = _iter_event_rows(df, eater_df, flour=flour, recipe=recipe)
+    bad = [(i + 2, col, value) for i, _, cells in rows for col, value in cells]
+    return unmatched, bad
+
+
+def scenarios_from_df(df: pd.DataFrame, eater_df: pd.DataFrame, *, flour: Flour = None, recipe: Recipe = None):
+    """Liest Events aus einer Tabelle (eine Zeile pro Event) als Generator von Szenarien.
+
+    Esser‑Spalten werden über den Namen den Faktoren aus `eater_df` zugeordnet, fehlende
+    Spalten zählen als 0, eine fehlende Hydration ist die Empfehlung des Mehls (sonst 60 %).
+    Zeilen mit ungültigen Werten werden übersprungen (siehe `check_events_df`).
+    """
+    for _, scenario, bad in _iter_event_rows(df, eater_df, flour=flour, recipe=recipe):
+        if not bad:
+            yield scenario
+
+
+def iter_recipe_cards_html(scenarios, lang: str, recipe: Recipe, flour: Flour = None):
+    """Streamt ein eigenständiges HTML‑Dokument (ohne externe Ressourcen), eine druckbare Karte pro Szenario.
+
+    Liefert Textstücke, damit auch tausende Karten direkt in eine Datei/Response geschrieben
+    werden können, ohne das ganze Dokument im Speicher zu halten.
+    """
+    labels = {k: html.escape(v) for k, v in _card_labels(lang).items()}
+    yield CARD_DOC_HEAD.substitute(lang=lang, title=html.escape(STRINGS.get(lang, STRINGS["de"])["title"]))
+    for scenario in scenarios:
+        values = _card_values(scenario, recipe, lang, flour)
+        extra_rows = "".join(
+            f'<tr><td>{html.escape(label)}</td><td class="v">{html.escape(value)}</td></tr>\n'
+            for label, value in values.pop("extras")
+        )
+        values = {k: html.escape(v) for k, v in values.items()}
+        yield CARD_TEMPLATE.substitute(labels, extra_rows=extra_rows, **values)
+    yield CARD_DOC_TAIL
+
+
+def build_recipe_cards(kind: str, events_df: pd.DataFrame, eater_df: pd.DataFrame, lang: str, recipe: Recipe,
+                       flour: Flour = None) -> bytes:
+    """Erzeugt die Karten‑Datei ("html"/"pdf") als Bytes für den Download‑Button.
+
+    Nur auf Klick aufrufen und nicht cachen: Streamlit hält die Download‑Daten ohnehin
+    im Speicher, ein Cache würde mehrere MB je Eintrag zusätzlich festhalten.
+    """
+    scenarios = scenarios_from_df(events_df, eater_df, flour=flour, recipe=recipe)
+    if kind == "pdf":
+        return render_recipe_cards_pdf(scenarios, lang, recipe, flour)
+    return b"".join(chunk.encode("utf-8") for chunk in iter_recipe_cards_html(scenarios, lang, recipe, flour))
+
+
+def render_recipe_cards_pdf(scenarios, lang: str, recipe: Recipe, flour: Flour = None) -> bytes:
+    """Rendert die Karten als PDF (eine Seite pro Szenario). Erfordert `fpdf2`."""
+    if not FPDF_AVAILABLE:
+        raise RuntimeError("PDF export requires the optional 'fpdf2' package")
+
+    def txt(s):
+        return str(s).translate(_PDF_CHARMAP).encode("latin-1", "replace").decode("latin-1")
+
+    labels = {k: txt(v) for k, v in _card_labels(lang).items()}
+    rows = (
+        ("l_need", "need", ""), ("l_make", "make", ""), ("l_left", "left", ""), ("l_hyd", "hydration", " %"),
+        ("l_flour", "flour", " g"), ("l_water", "water", " ml"), ("l_yeast", "yeast", " g"), ("l_salt", "salt", " g"),
+    )
+    pdf = FPDF(format="A5")
+    pdf.set_auto_page_break(auto=True, margin=12)
+    for scenario in scenarios:
+        v = _card_values(scenario, recipe, lang, flour)
+        extras = [(txt(label), txt(value)) for label, value in v.pop("extras")]
+        v = {k: txt(x) for k, x in v.items()}
+        pdf.add_page()
+        pdf.set_font("Helvetica", "B", 16)
+        pdf.set_text_color(255, 75, 75)
+        pdf.cell(0, 10, v["event"], new_x="LMARGIN", new_y="NEXT")
+        pdf.set_text_color(11, 15, 20)
+        for label_key, value_key, unit in rows:
+            pdf.set_font("Helvetica", "", 11)
+            pdf.cell(80, 7, labels[label_key])
+            pdf.set_font("Helvetica", "B", 11)
+            pdf.cell(0, 7, v[value_key] + unit, align="R", new_x="LMARGIN", new_y="NEXT")
+        for label, value in extras:
+            pdf.set_font("Helvetica", "", 11)
+            pdf.cell(40, 7, label)
+            pdf.set_font("Helvetica", "B", 11)
+            pdf.cell(0, 7, value, align="R", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", "", 9)
+        pdf.set_text_color(107, 114, 128)
+        pdf.multi_cell(0, 5, v["hint"], new_x="LMARGIN", new_y="NEXT")
+        pdf.set_text_color(11, 15, 20)
+        pdf.ln(2)
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 8, labels["l_prep"], new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", "", 10)
+        pdf.multi_cell(0, 5, labels["prep"])
+    return bytes(pdf.output())
 
 # ---------- Header ----------
 col_title, col_badge = st.columns([0.8, 0.2])
@@ -731,13 +2108,43 @@ with left:
 
     gabriel_on = st.toggle(T("gabriel"), value=False, help=T("gabriel_help"))
 
+    # Mehl aus dem Katalog (nur wenn eine Katalogdatei vorhanden ist)
+    flour_catalog = load_flour_catalog()
+    if flour_catalog is not None:
+        f1, f2 = st.columns([1, 2])
+        with f1:
+            flour_query = st.text_input(T("flour_search"), key="flour_query")
+        current = st.session_state.flour
+        options = [None] + flour_catalog.search(flour_query)
+        if current is not None and current not in options:
+            options.insert(1, current)
+        with f2:
+            st.session_state.flour = st.selectbox(
+                T("flour_pick"),
+                options=options,
+                index=options.index(current),
+                format_func=lambda f: T("flour_generic") if f is None else f"{f.name} ({f.sku})",
+                key="flour_pick",
+            )
+        if st.session_state.flour is not None:
+            f = st.session_state.flour
+            st.caption(T("flour_info").format(protein=f.protein_pct, w=f.w_strength, hyd=f.hydration_pct, ppk=effective_pizzas_per_kg(st.session_state.recipe, f)))
+
     hydration = st.select_slider(
         T("hydration"),
-        options=list(range(50, 101, 5)),
-        value=60,
+        options=list(range(HYDRATION_MIN, HYDRATION_MAX + 1, 5)),
+        value=recommended_hydration(st.session_state.flour),
         help="Wasseranteil in % bezogen auf die Mehlmenge.",
     )
 
+    # Vorteig‑Anteil an die Hydration anpassen, statt dessen Wasser still zu kappen
+    r = st.session_state.recipe
+    max_share = 5 * math.floor(max_preferment_flour_pct(r.preferment, hydration) / 5)
+    if r.preferment != "none" and r.preferment_flour_pct > max_share:
+        msg = T("preferment_capped").format(hyd=hydration, pre=T(r.preferment), pct=f"{r.preferment_flour_pct:.0f}", max=max_share)
+        (preferment_note if preferment_note is not None else st).warning(msg)
+        r.preferment_flour_pct = float(max_share)
+
 with right:
     st.subheader(T("prep_title"))
     st.markdown(f"<div class='panel'>{T('prep_text')}</div>", unsafe_allow_html=True)
@@ -750,8 +2157,18 @@ res = compute_requirements(
     hydration_pct=hydration,
     gabriel_on=gabriel_on,
     recipe=st.session_state.recipe,
+    flour=st.session_state.flour,
 )
 
+# Nur echte Berechnungen loggen: keine leeren Eingaben, keine Reruns mit unveränderten Werten
+_log_key = (
+    tuple(eaters.items()), hydration, gabriel_on, tuple(asdict(st.session_state.recipe).values()),
+    st.session_state.flour.sku if st.session_state.flour is not None else None,
+)
+if res["need_equiv_pizzas"] > 0 and st.session_state.get("_last_logged") != _log_key:
+    get_calc_log().append(hydration, gabriel_on, eaters, res, st.session_state.recipe, st.session_state.flour)
+    st.session_state._last_logged = _log_key
+
 # ---------- Ergebnisse ----------
 st.subheader(T("result"))
 
@@ -774,20 +2191,146 @@ i2.metric(T("water"), f"{res['water_ml']:.0f} ml")
 i3.metric(T("yeast"), f"{res['yeast_g']:.1f} g")
 i4.metric(T("salt"), f"{res['salt_g']:.1f} g")
 
+extras = [k for k in ("oil", "sugar", "malt") if res[f"{k}_g"] > 0]
+if extras:
+    for col, k in zip(st.columns(4), extras):
+        col.metric(T(k), f"{res[f'{k}_g']:.1f} g")
+
+if len(res["stages"]) > 1:
+    st.caption(T("stages"))
+    st.dataframe(
+        pd.DataFrame(
+            {T(stage): {T(k): round(v, 1) for k, v in q.items() if k in ("flour", "water", "yeast", "salt", *extras)}
+             for stage, q in res["stages"].items()}
+        ),
+        use_container_width=True,
+    )
+
 st.caption(T("teig_hint").format(dough=f"{res['dough_g']:.0f}", std=f"{st.session_state.recipe.normal_pizza_g:.1f}"))
 
 with st.expander(T("details")):
     st.markdown(
         T("details_md").format(
-            pizzas_per_kg=st.session_state.recipe.pizzas_per_kg,
+            pizzas_per_kg=effective_pizzas_per_kg(st.session_state.recipe, st.session_state.flour),
             yeast=st.session_state.recipe.yeast_per_kg,
             salt=st.session_state.recipe.salt_per_kg,
         )
     )
 
+with st.expander("🔄 " + T("inverse")):
+    st.caption(T("inverse_caption"))
+    s1, s2, s3 = st.columns(3)
+    stock_flour_kg = s1.number_input(T("stock_flour_kg"), min_value=0.0, value=None, step=0.5, key="stock_flour_kg")
+    stock_yeast_g = s2.number_input(T("stock_yeast_g"), min_value=0.0, value=None, step=1.0, key="stock_yeast_g")
+    stock_salt_g = s3.number_input(T("stock_salt_g"), min_value=0.0, value=None, step=5.0, key="stock_salt_g")
+    stock = {
+        k: v for k, v in (
+            ("flour_g", None if stock_flour_kg is None else stock_flour_kg * 1000.0),
+            ("yeast_g", stock_yeast_g),
+            ("salt_g", stock_salt_g),
+        ) if v is not None
+    }
+    eater_factors = {name: factor for name, (factor, _) in eaters.items()}
+    current_mix = {name: count for name, (_, count) in eaters.items()}
+    if stock:
+        inv = solve_max_guests(pd.DataFrame([stock]), hydration, st.session_state.recipe, eater_factors,
+                               mix=current_mix, flour=st.session_state.flour).iloc[0]
+        limiting_label = {"flour_g": "flour", "water_ml": "water", "yeast_g": "yeast", "salt_g": "salt"}
+        v1, v2 = st.columns(2)
+        v1.metric(T("max_pizzas"), f"{int(inv['max_pizzas'])}")
+        v2.metric(T("limiting"), T(limiting_label[inv["limiting"]]))
+        st.dataframe(
+            pd.DataFrame([{"name": n, T("max_alone"): int(inv[GUESTS_MAX_PREFIX + n])} for n, f in eater_factors.items() if f > 0]),
+            hide_index=True,
+            use_container_width=True,
+        )
+        if "mix_units" in inv:
+            guests = ", ".join(
+                f"{int(inv[GUESTS_MIX_PREFIX + n])} {n}" for n in current_mix if GUESTS_MIX_PREFIX + n in inv
+            )
+            st.markdown(T("mix_result").format(units=int(inv["mix_units"]), guests=guests))
+    inv_up = st.file_uploader(T("inventory_upload"), type=["csv"], key="inventory_upload")
+    if inv_up is not None:
+        inv_res = None
+        try:
+            inv_df = pd.read_csv(inv_up)
+            if not set(INVENTORY_COLUMNS) & set(inv_df.columns):
+                st.error(T("inventory_missing").format(cols=", ".join(INVENTORY_COLUMNS)))
+            else:
+                inv_res = solve_max_guests(inv_df, hydration, st.session_state.recipe, eater_factors,
+                                           mix=current_mix, flour=st.session_state.flour)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError, ValueError) as e:
+            st.error(T("inventory_error").format(err=e))
+        if inv_res is not None:
+            st.dataframe(
+                inv_df.join(inv_res, rsuffix=f" ({T('computed')})"),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+if st.session_state.expert:
+    with st.expander("📈 " + T("stats")):
+        calc_log = get_calc_log()
+        days = st.select_slider(T("stats_days"), options=[7, 30, 90, 365, 3650], value=30, key="stats_days")
+        since = time.time() - days * 86400
+        k1, k2, k3 = st.columns(3)
+        count = calc_log.aggregate("guests", "count", start=since)
+        k1.metric(T("stats_count"), f"{count}")
+        # Leeres Zeitfenster ⇒ kein Mittelwert (statt "nan")
+        k2.metric(T("stats_guests"), f"{calc_log.aggregate('guests', 'mean', start=since):.1f}" if count else "–")
+        k3.metric(T("stats_pizzas"), f"{calc_log.aggregate('pizzas_to_make', 'mean', start=since):.1f}" if count else "–")
+        flour_month = calc_log.aggregate("flour_g", "sum", start=since, freq="M") / 1000.0
+        if len(flour_month):
+            st.caption(T("stats_flour_month"))
+            st.bar_chart(flour_month.rename(T("flour")))
+
+with st.expander("🖨️ " + T("cards")):
+    st.caption(T("cards_caption"))
+    eater_names = [str(n) for n in st.session_state.eater_df["name"]]
+    template_df = pd.DataFrame([{"event": T("event") + " 1", "hydration": hydration, "gabriel": False, **{n: 0 for n in eater_names}}])
+    st.download_button(T("cards_template"), data=template_df.to_csv(index=False), file_name="pizza_events.csv", mime="text/csv")
+    cards_up = st.file_uploader(T("cards_upload"), type=["csv"], key="cards_upload")
+    events_df = None
+    if cards_up is not None:
+        csv_bytes = cards_up.getvalue()
+        try:
+            events_df = pd.read_csv(io.BytesIO(csv_bytes))
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            st.error(T("cards_csv_error").format(err=e))
+    if events_df is not None:
+        unmatched, bad = check_events_df(
+            events_df, st.session_state.eater_df, flour=st.session_state.flour, recipe=st.session_state.recipe
+        )
+        if unmatched:
+            st.warning(T("cards_unmatched").format(cols=", ".join(unmatched)))
+        if bad:
+            st.error(
+                T("cards_bad").format(n=len(bad)) + "\n"
+                + "\n".join("- " + T("cards_bad_cell").format(row=r, col=c, value=v) for r, c, v in bad[:20])
+            )
+        st.caption(T("cards_count").format(n=len(events_df) - len({r for r, _, _ in bad})))
+        # Erst auf Klick erzeugen – normale Reruns bleiben davon unberührt
+        build_args = (events_df, st.session_state.eater_df, st.session_state.lang, st.session_state.recipe, st.session_state.flour)
+        kinds = [("html", T("cards_html"), "pizza_cards.html", "text/html")]
+        if FPDF_AVAILABLE:
+            kinds.append(("pdf", T("cards_pdf"), "pizza_cards.pdf", "application/pdf"))
+        for col, (kind, label, file_name, mime) in zip(st.columns(len(kinds)), kinds):
+            with col:
+                if st.button(label, key=f"cards_build_{kind}"):
+                    st.download_button(
+                        "⬇️ " + T("cards_download").format(file=file_name),
+                        data=build_recipe_cards(kind, *build_args),
+                        file_name=file_name,
+                        mime=mime,
+                        key=f"cards_download_{kind}",
+                    )
 
 st.markdown(f"<div class='small' style='opacity:.8'>{T('note')}</div>", unsafe_allow_html=True)
 
+# ---------- Session extern sichern ----------
+if _has_ctx():
+    _persist_session_state()
+
 if _has_ctx():
     if "printed_ok" not in st.session_state:
         print("...App started successfully. Visit locally at: http://localhost:8501")
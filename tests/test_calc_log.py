@@ -0,0 +1,153 @@
+"""Berechnungs‑Log: Puffer, Segmente und Aggregat‑Abfragen."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402  (läuft im Bare‑Modus ohne Streamlit‑Server)
+
+RES = {
+    "need_equiv_pizzas": 3.5, "pizzas_to_make": 4, "leftover_pizzas": 0.5, "flour_g": 666.7,
+    "water_ml": 400.0, "yeast_g": 4.7, "salt_g": 21.3, "oil_g": 0.0, "sugar_g": 0.0, "malt_g": 0.0, "dough_g": 1092.7,
+}
+EATERS = {"Normal-Esser": (1.0, 3), "Viel-Esser": (1.5, 1)}
+RECIPE = app.Recipe()
+
+
+@pytest.fixture
+def calc_log(tmp_path):
+    return app.CalcLog(str(tmp_path / "log"), flush_every=10_000, max_delay_s=3600)
+
+
+def test_flush_failure_keeps_rows_and_logs_once(tmp_path, monkeypatch, caplog):
+    calc_log = app.CalcLog(str(tmp_path / "log"), max_delay_s=3600)  # Thread schläft, Durchläufe per _tick()
+
+    def read_only(*args):
+        raise OSError("read-only file system")
+
+    with caplog.at_level("WARNING", logger="pizza_dough"):
+        monkeypatch.setattr(app.os, "replace", read_only)
+        calc_log.append(60, False, EATERS, RES, RECIPE, ts=1000.0)
+        for _ in range(5):  # viele fehlgeschlagene Hintergrund‑Flushes
+            calc_log._tick()
+        assert len(calc_log._buffer) == 1
+        monkeypatch.undo()
+        calc_log._tick()
+    messages = [r.getMessage() for r in caplog.records]
+    assert sum("failed" in m for m in messages) == 1
+    assert any("recovered" in m for m in messages)
+    assert calc_log.aggregate("guests", "count") == 1
+    assert len(list((tmp_path / "log").glob("seg-*.npy"))) == 1
+
+
+def _fill(calc_log, segments, rows_per_segment, t0=1_600_000_000.0, step=60.0):
+    ts = t0
+    for _ in range(segments):
+        for _ in range(rows_per_segment):
+            calc_log.append(60, False, EATERS, RES, RECIPE, ts=ts)
+            ts += step
+        calc_log.flush()
+    return ts
+
+
+def test_small_segments_are_compacted(calc_log):
+    calc_log.compact_at = 4
+    _fill(calc_log, segments=50, rows_per_segment=3)
+    manifest = calc_log._read_manifest()
+    assert len(manifest) < 4
+    assert sum(e[1] for e in manifest) == 150
+    assert sorted(p.name for p in Path(calc_log.path).glob("seg-*.npy")) == sorted(e[0] for e in manifest)
+    assert calc_log.aggregate("guests", "count") == 150
+    assert calc_log.aggregate("guests", "sum") == 600
+
+
+def test_time_window_and_monthly_aggregates(calc_log):
+    t0 = 1_600_000_000.0
+    _fill(calc_log, segments=10, rows_per_segment=100, t0=t0, step=3600.0)
+    assert calc_log.aggregate("guests", "count", start=t0 + 100 * 3600, end=t0 + 200 * 3600) == 100
+    assert calc_log.aggregate("guests", "count", start=t0 + 2000 * 3600) == 0
+    assert calc_log.aggregate("flour_g", "sum", freq="M").sum() == pytest.approx(1000 * RES["flour_g"])
+    df = calc_log.query(("ts", "pizzas_to_make"), start=t0, end=t0 + 10 * 3600)
+    assert list(df["pizzas_to_make"]) == [4.0] * 10
+
+
+def test_open_segments_are_bounded(calc_log):
+    calc_log.compact_at = 10_000
+    calc_log.max_open = 5
+    _fill(calc_log, segments=20, rows_per_segment=2)
+    assert calc_log.aggregate("guests", "count") == 40
+    assert len(calc_log._segments) <= 5
+
+
+def test_reader_sees_other_writers_and_compaction(tmp_path):
+    path = str(tmp_path / "log")
+    writer = app.CalcLog(path, max_delay_s=3600, compact_at=3)
+    reader = app.CalcLog(path, max_delay_s=3600)
+    _fill(writer, segments=2, rows_per_segment=5)
+    assert reader.aggregate("guests", "count") == 10
+    _fill(writer, segments=5, rows_per_segment=5, t0=1_700_000_000.0)  # löst Kompaktierung aus
+    assert reader.aggregate("guests", "count") == 35
+
+
+def test_segments_from_before_the_manifest_are_adopted(tmp_path):
+    path = tmp_path / "log"
+    path.mkdir()
+    block = app.np.ones((len(app.CALC_LOG_COLUMNS), 7))
+    block[0] = 1_600_000_000.0 + app.np.arange(7)
+    block[app.CALC_LOG_COLUMNS.index("guests")] = 3
+    app.np.save(path / f"seg-v{app.CALC_LOG_VERSION}-00000000000000000001-1-1.npy", block)
+    assert app.CalcLog(str(path), max_delay_s=3600).aggregate("guests", "sum") == 21
+
+
+def test_unusable_directory_falls_back_to_a_no_op_log(tmp_path, monkeypatch, caplog):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setattr(app, "CALC_LOG_DIR", str(blocker / "log"))
+    app.get_calc_log.clear()
+    try:
+        with caplog.at_level("WARNING", logger="pizza_dough"):
+            calc_log = app.get_calc_log()
+            assert app.get_calc_log() is calc_log
+        assert isinstance(calc_log, app.NullCalcLog)
+        assert sum("unavailable" in r.getMessage() for r in caplog.records) == 1
+        calc_log.append(60, False, EATERS, RES, RECIPE)
+        calc_log.flush()
+        assert calc_log.aggregate("guests", "count") == 0
+        assert calc_log.aggregate("flour_g", "sum", freq="M").empty
+        assert calc_log.query(("ts", "guests")).empty
+    finally:
+        app.get_calc_log.clear()
+
+
+def test_inputs_recipe_and_extra_outputs_are_logged(calc_log):
+    recipe = app.Recipe(oil_per_kg=20.0, preferment="biga", preferment_flour_pct=50.0)
+    flour = app.Flour("T00-W260", "Tipo 00 W260")
+    res = app.compute_requirements(EATERS, 65, False, recipe, flour)
+    calc_log.append(65, False, EATERS, res, recipe, flour, ts=1000.0)
+    calc_log.append(60, True, {"Normal-Esser": (1.0, 2)}, RES, RECIPE, ts=2000.0)
+    calc_log.flush()
+
+    row = calc_log.query(start=1000.0, end=1001.0).iloc[0]
+    assert row["guests"] == 4 and row["hydration_pct"] == 65
+    assert app.PREFERMENT_CODES[int(row["preferment"])] == "biga" and row["preferment_flour_pct"] == 50
+    assert res["oil_g"] > 0 and row["oil_per_kg"] == 20 and row["oil_g"] == pytest.approx(res["oil_g"])
+
+    # frische Instanz: Eingaben kommen aus inputs.jsonl, nicht aus dem Prozess‑Puffer
+    inputs = app.CalcLog(calc_log.path, max_delay_s=3600).query_inputs()
+    assert inputs["flour_sku"][0] == "T00-W260" and app.pd.isna(inputs["flour_sku"][1])
+    assert list(inputs["Normal-Esser"]) == [3, 2]
+    assert list(inputs["Viel-Esser"]) == [1, 0]
+
+
+def test_each_input_combination_is_stored_once(calc_log):
+    for ts in range(50):
+        calc_log.append(60, False, EATERS, RES, RECIPE, ts=float(ts))
+        if ts % 10 == 9:
+            calc_log.flush()
+    lines = (Path(calc_log.path) / "inputs.jsonl").read_text().splitlines()
+    assert len(lines) == 1
+    assert len(calc_log.query_inputs()) == 50
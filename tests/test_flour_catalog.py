@@ -0,0 +1,93 @@
+"""Mehl‑Katalog: Index über die gemappte CSV, Präfixsuche und Mehl‑Kennzahlen."""
+
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402  (läuft im Bare‑Modus ohne Streamlit‑Server)
+
+HEADER = "sku,name,protein_pct,w_strength,hydration_pct,yield_factor"
+
+
+def _catalog(tmp_path, *lines, newline="\n", bom=False):
+    path = tmp_path / "flours.csv"
+    path.write_bytes((b"\xef\xbb\xbf" if bom else b"") + newline.join((HEADER, *lines)).encode("utf-8"))
+    return app.FlourCatalog(str(path))
+
+
+def test_prefix_search_is_sorted_and_case_insensitive(tmp_path):
+    cat = _catalog(
+        tmp_path,
+        "T00-W320,Tipo 00 W320,13,320,65,1.02",
+        "MAN,Manitoba,14,380,70,1.05",
+        "T00-W200,Tipo 00 W200,11,200,55,0.98",
+        "T1,Tipo 1,12,260,62,1.0",
+    )
+    assert len(cat) == 4
+    assert [f.sku for f in cat.search("tipo 00")] == ["T00-W200", "T00-W320"]
+    assert [f.sku for f in cat.search("  TIPO")] == ["T00-W200", "T00-W320", "T1"]
+    assert [f.sku for f in cat.search("tipo", limit=1)] == ["T00-W200"]
+    assert cat.search("zz") == []
+    assert [f.sku for f in cat.search("")] == ["MAN", "T00-W200", "T00-W320", "T1"]
+    assert cat.search("man")[0] == app.Flour("MAN", "Manitoba", 14.0, 380.0, 70.0, 1.05)
+
+
+def test_quoted_commas_crlf_and_bom(tmp_path):
+    cat = _catalog(tmp_path, 'VK,"Vollkornmehl, fein",13,250,72,0.95', "", newline="\r\n", bom=True)
+    (flour,) = cat.search("voll")
+    assert (flour.sku, flour.name, flour.hydration_pct) == ("VK", "Vollkornmehl, fein", 72.0)
+
+
+def test_missing_numbers_fall_back_to_defaults(tmp_path):
+    (flour,) = _catalog(tmp_path, "X,Nur Name,,,,").search("")
+    assert flour == app.Flour("X", "Nur Name")
+
+
+def test_malformed_rows_are_skipped(tmp_path):
+    cat = _catalog(
+        tmp_path,
+        "OK,Gut,12,260,60,1.0",
+        "BAD,Schlecht,n/a,260,60,1.0",
+        ",Ohne SKU,12,260,60,1.0",
+        "NEG,Negativ,12,260,60,-1",
+    )
+    assert [f.sku for f in cat.search("")] == ["OK"]
+    assert cat.skipped == [3, 4, 5]
+
+
+def test_header_without_sku_or_name_is_rejected(tmp_path):
+    path = tmp_path / "flours.csv"
+    path.write_text("code,title\nA,B\n")
+    with pytest.raises(ValueError, match="sku, name"):
+        app.FlourCatalog(str(path))
+
+
+def test_load_flour_catalog_logs_and_returns_none(tmp_path, caplog):
+    path = tmp_path / "flours.csv"
+    path.write_text("code,title\nA,B\n")
+    with caplog.at_level(logging.WARNING, logger="pizza_dough"):
+        assert app.load_flour_catalog(str(path)) is None
+    assert "not loaded" in caplog.text
+    assert app.load_flour_catalog(str(tmp_path / "missing.csv")) is None
+
+
+def test_shipped_catalog_loads_cleanly():
+    cat = app.FlourCatalog(str(ROOT / "flours.csv"))
+    assert len(cat) > 0 and cat.skipped == []
+
+
+@pytest.mark.parametrize("hydration, expected", [(None, 60), (55, 55), (62, 60), (63, 65), (40, 50), (120, 100)])
+def test_recommended_hydration_snaps_to_slider(hydration, expected):
+    flour = None if hydration is None else app.Flour("X", "X", hydration_pct=hydration)
+    assert app.recommended_hydration(flour) == expected
+
+
+def test_effective_pizzas_per_kg_uses_yield_factor():
+    recipe = app.Recipe(pizzas_per_kg=6.0)
+    assert app.effective_pizzas_per_kg(recipe) == 6.0
+    assert app.effective_pizzas_per_kg(recipe, app.Flour("X", "X", yield_factor=1.05)) == pytest.approx(6.3)
@@ -0,0 +1,47 @@
+"""Vorteig: Aufteilung der Zutaten und Grenzen durch die Hydration."""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402  (läuft im Bare‑Modus ohne Streamlit‑Server)
+
+EATERS = pd.DataFrame([{"name": "Normal", "factor": 1.0}])
+
+
+def test_poolish_takes_its_water_from_the_total():
+    recipe = app.Recipe(preferment="poolish", preferment_flour_pct=30)
+    res = app.compute_requirements({"Normal": (1.0, 6)}, 60, False, recipe)
+    pre, main = res["stages"]["poolish"], res["stages"]["main"]
+    assert pre["water"] == pytest.approx(pre["flour"])
+    assert pre["flour"] + main["flour"] == pytest.approx(res["flour_g"])
+    assert pre["water"] + main["water"] == pytest.approx(res["water_ml"])
+
+
+@pytest.mark.parametrize("preferment, hydration, expected", [
+    ("none", 60, 100.0), ("poolish", 60, 60.0), ("biga", 60, 100.0), ("biga", 40, 80.0),
+])
+def test_max_preferment_flour_pct(preferment, hydration, expected):
+    assert app.max_preferment_flour_pct(preferment, hydration) == expected
+
+
+def test_infeasible_share_raises_instead_of_capping():
+    recipe = app.Recipe(preferment="poolish", preferment_flour_pct=80)
+    with pytest.raises(ValueError, match="hydration"):
+        app.compute_requirements({"Normal": (1.0, 6)}, 60, False, recipe)
+    res = app.compute_requirements({"Normal": (1.0, 6)}, 80, False, recipe)
+    assert res["stages"]["main"]["water"] == pytest.approx(0.0)
+
+
+def test_card_rows_too_dry_for_the_preferment_are_reported():
+    recipe = app.Recipe(preferment="poolish", preferment_flour_pct=70)
+    events = pd.DataFrame([{"event": "a", "hydration": 60, "Normal": 3}, {"event": "b", "hydration": 75, "Normal": 3}])
+    _, bad = app.check_events_df(events, EATERS, recipe=recipe)
+    assert bad == [(2, "hydration", 60)]
+    assert [s["event"] for s in app.scenarios_from_df(events, EATERS, recipe=recipe)] == ["b"]
+    assert app.check_events_df(events, EATERS) == ([], [])
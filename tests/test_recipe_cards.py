@@ -0,0 +1,80 @@
+"""Rezeptkarten: Event‑CSV prüfen/parsen und HTML erzeugen."""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402  (läuft im Bare‑Modus ohne Streamlit‑Server)
+
+EATERS_DE = pd.DataFrame([
+    {"name": "Wenig-Esser", "factor": 0.5}, {"name": "Normal-Esser", "factor": 1.0}, {"name": "Viel-Esser", "factor": 1.5},
+])
+EATERS_EN = EATERS_DE.assign(name=EATERS_DE["name"].map(app.EATER_NAMES_DE_TO_EN))
+
+
+def _html(events, lang="de", eaters=EATERS_DE):
+    scenarios = app.scenarios_from_df(pd.DataFrame(events), eaters)
+    return "".join(app.iter_recipe_cards_html(scenarios, lang, app.Recipe()))
+
+
+def test_event_names_are_escaped():
+    doc = _html([{"event": '<script>alert("x")</script> & Co', "Normal-Esser": 2}])
+    assert "<script>" not in doc
+    assert "&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt; &amp; Co" in doc
+
+
+def test_german_and_english_cards():
+    de = _html([{"event": "Fest", "hydration": 65, "Normal-Esser": 3}], "de")
+    en = _html([{"event": "Party", "hydration": 65, "Normal-Esser": 3}], "en")
+    assert '<html lang="de">' in de and '<html lang="en">' in en
+    assert app.STRINGS["de"]["need_pizzas"] in de and app.STRINGS["en"]["need_pizzas"] not in de
+    assert app.STRINGS["en"]["need_pizzas"] in en
+    # gleiche Zahlen, nur andere Beschriftung
+    assert de.count('class="v"') == en.count('class="v"') and "65 %" in de and "65 %" in en
+
+
+def test_one_card_per_valid_row_and_same_numbers_as_the_app():
+    doc = _html([{"event": "A", "Normal-Esser": 3, "Viel-Esser": 1}, {"event": "B", "Wenig-Esser": 4}])
+    assert doc.count('<section class="card">') == 2
+    res = app.compute_requirements({"n": (1.0, 3), "v": (1.5, 1)}, 60, False, app.Recipe())
+    assert f'{res["flour_g"]:.0f} g' in doc
+
+
+@pytest.mark.parametrize("column, value", [
+    ("Normal-Esser", 2.5), ("Normal-Esser", -1), ("Normal-Esser", "viele"),
+    ("gabriel", "vielleicht"), ("hydration", 45), ("hydration", 105), ("hydration", "nass"),
+])
+def test_bad_cells_are_reported_and_the_row_skipped(column, value):
+    events = pd.DataFrame([
+        {"event": "gut", "hydration": 60, "gabriel": "ja", "Normal-Esser": 2},
+        {"event": "schlecht", "hydration": 60, "gabriel": "nein", "Normal-Esser": 2, column: value},
+    ])
+    unmatched, bad = app.check_events_df(events, EATERS_DE)
+    assert unmatched == []
+    assert bad == [(3, column, value)]
+    assert [s["event"] for s in app.scenarios_from_df(events, EATERS_DE)] == ["gut"]
+
+
+def test_gabriel_words_and_empty_cells():
+    events = pd.DataFrame([{"gabriel": "JA", "Normal-Esser": 1.0}, {"gabriel": None, "Normal-Esser": None}])
+    a, b = app.scenarios_from_df(events, EATERS_DE, flour=app.Flour("X", "X", hydration_pct=70))
+    assert (a["event"], a["gabriel"], a["hydration"], a["eaters"]["Normal-Esser"]) == ("#1", True, 70, (1.0, 1))
+    assert (b["gabriel"], b["eaters"]["Normal-Esser"]) == (False, (1.0, 0))
+
+
+@pytest.mark.parametrize("columns, eaters", [
+    (["Normal-Eater", "Heavy-Eater"], EATERS_DE),
+    (["Normal-Esser", "Viel-Esser"], EATERS_EN),
+])
+def test_default_eater_names_match_in_both_languages(columns, eaters):
+    events = pd.DataFrame([{"event": "x", columns[0]: 2, columns[1]: 1, "Gast": 5}])
+    unmatched, bad = app.check_events_df(events, eaters)
+    assert unmatched == ["Gast"] and bad == []
+    (scenario,) = app.scenarios_from_df(events, eaters)
+    counts = {name: count for name, (_, count) in scenario["eaters"].items()}
+    assert sorted(counts.values()) == [0, 1, 2]
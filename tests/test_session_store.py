@@ -0,0 +1,169 @@
+"""Session‑Backends: Serialisierung und Wiederherstellung über mehrere Worker‑Prozesse."""
+
+import os
+import subprocess
+import sys
+import textwrap
+from dataclasses import asdict
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402  (läuft im Bare‑Modus ohne Streamlit‑Server)
+
+SID = "0123456789abcdef0123456789abcdef"
+
+WORKER = textwrap.dedent(
+    """
+    import sys
+    from streamlit.testing.v1 import AppTest
+
+    role, sid = sys.argv[1], sys.argv[2]
+    at = AppTest.from_file(sys.argv[3], default_timeout=60)
+    at.query_params["sid"] = sid
+    at.run()
+    assert not at.exception, [e.value for e in at.exception]
+    if role == "writer":
+        at.session_state["theme"] = "dark"
+        at.session_state["expert"] = True
+        at.run()
+        assert not at.exception, [e.value for e in at.exception]
+        # Write‑behind: der Puffer wird spätestens beim Beenden des Prozesses geflusht
+    else:
+        print(at.session_state["theme"], at.session_state["expert"])
+    """
+)
+
+
+class State(dict):
+    """Minimaler Ersatz für st.session_state (Attribut‑ und dict‑Zugriff)."""
+
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+def _state(**overrides):
+    state = State(
+        recipe=app.Recipe(yeast_per_kg=9.5),
+        eater_df=pd.DataFrame([{"name": "Normal-Esser", "factor": 1.0}, {"name": "Kind", "factor": 0.4}]),
+        lang="en",
+        theme="dark",
+        expert=True,
+        _last_lang="en",
+        flour=app.Flour(sku="MAN-W380", name="Manitoba W380", hydration_pct=70.0, yield_factor=1.04),
+    )
+    state.update(overrides)
+    return state
+
+
+def test_round_trip():
+    blob = app.dump_session_state(_state())
+    assert blob[0] == app.SESSION_FORMAT_VERSION
+
+    restored = State()
+    assert app.load_session_state(blob, restored)
+    assert asdict(restored.recipe) == asdict(app.Recipe(yeast_per_kg=9.5))
+    assert restored.eater_df.to_dict(orient="records") == [
+        {"name": "Normal-Esser", "factor": 1.0},
+        {"name": "Kind", "factor": 0.4},
+    ]
+    assert (restored.lang, restored.theme, restored.expert, restored._last_lang) == ("en", "dark", True, "en")
+    assert restored.flour == _state().flour
+
+
+def test_round_trip_without_flour():
+    restored = State()
+    assert app.load_session_state(app.dump_session_state(_state(flour=None)), restored)
+    assert restored.flour is None
+
+
+@pytest.mark.parametrize("blob", [None, b"", bytes([app.SESSION_FORMAT_VERSION + 1]) + b"x", b"\x01not-zlib"])
+def test_load_rejects_unknown_or_broken_blobs(blob):
+    restored = State()
+    assert not app.load_session_state(blob, restored)
+    assert restored == {}
+
+
+def test_version_byte_mismatch():
+    blob = app.dump_session_state(_state())
+    future = bytes([blob[0] + 1]) + blob[1:]
+    restored = State()
+    assert not app.load_session_state(future, restored)
+    assert restored == {}
+
+
+def _run_worker(role, backend, path):
+    env = {**os.environ, "PIZZA_SESSION_BACKEND": backend, "PIZZA_SESSION_PATH": str(path),
+           "PIZZA_CALC_LOG_DIR": str(path / "calc_log")}
+    proc = subprocess.run(
+        [sys.executable, "-c", WORKER, role, SID, str(ROOT / "app.py")],
+        env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr
+    return proc.stdout
+
+
+@pytest.mark.parametrize("backend", ["file", "kv"])
+def test_other_worker_restores_session(backend, tmp_path):
+    _run_worker("writer", backend, tmp_path)
+    out = _run_worker("reader", backend, tmp_path)
+    assert out.strip().splitlines()[-1] == "dark True"
+
+
+def test_memory_backend_is_process_local(tmp_path):
+    _run_worker("writer", "memory", tmp_path)
+    out = _run_worker("reader", "memory", tmp_path)
+    assert out.strip().splitlines()[-1] == "light False"
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = app.MemorySessionStore(max_sessions=2)
+    store.put_many({"a": b"1", "b": b"2"})
+    assert store.get("a") == b"1"  # a ist jetzt zuletzt benutzt
+    store.put_many({"c": b"3"})
+    assert store.get("b") is None
+    assert (store.get("a"), store.get("c")) == (b"1", b"3")
+
+
+@pytest.mark.parametrize("backend", ["memory", "file", "kv"])
+def test_sweep_removes_expired_sessions(backend, tmp_path, monkeypatch):
+    store = app.make_session_store(backend, str(tmp_path)).backend
+    now = app.time.time()
+    monkeypatch.setattr(app.time, "time", lambda: now - 3600)
+    store.put_many({"stale": b"1"})
+    if backend == "file":
+        os.utime(tmp_path / "stale.session", (now - 3600, now - 3600))
+    monkeypatch.setattr(app.time, "time", lambda: now)
+    store.put_many({"fresh": b"2"})
+
+    store.sweep(60)
+    assert store.get("stale") is None
+    assert store.get("fresh") == b"2"
+
+
+def test_flush_failure_is_logged_once_and_retried(caplog):
+    class Broken(app.MemorySessionStore):
+        fail = True
+
+        def put_many(self, items):
+            if self.fail:
+                raise OSError("disk full")
+            super().put_many(items)
+
+    backend = Broken()
+    store = app.WriteBehindStore(backend, max_delay_s=3600)  # Thread schläft, Durchläufe per _tick()
+    with caplog.at_level("WARNING", logger="pizza_dough"):
+        store.put("a", b"1")
+        for _ in range(5):
+            store._tick()
+        assert backend.get("a") is None
+        backend.fail = False
+        store._tick()
+    messages = [r.getMessage() for r in caplog.records]
+    assert sum("failed" in m for m in messages) == 1
+    assert any("recovered" in m for m in messages)
+    assert backend.get("a") == b"1"
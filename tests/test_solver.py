@@ -0,0 +1,78 @@
+"""Umkehrrechnung: Vorrat ⇒ maximale Gäste, konsistent mit compute_requirements."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import app  # noqa: E402  (läuft im Bare‑Modus ohne Streamlit‑Server)
+
+RECIPE = app.Recipe()
+FACTORS = {"Kind": 0.1, "Normal": 1.0, "Hungrig": 0.7}
+
+
+def _pizzas(selection, hydration=60):
+    return app.compute_requirements(selection, hydration, False, RECIPE)["pizzas_to_make"]
+
+
+def _stock(pizzas, hydration=60):
+    """Vorrat, der für genau `pizzas` Pizzen reicht (alle vier Zutaten)."""
+    res = app.compute_requirements({"Normal": (1.0, pizzas)}, hydration, False, RECIPE)
+    return {"flour_g": res["flour_g"], "water_ml": res["water_ml"], "yeast_g": res["yeast_g"], "salt_g": res["salt_g"]}
+
+
+@pytest.mark.parametrize("pizzas", [0, 1, 7, 23])
+def test_max_guests_round_trip_through_compute_requirements(pizzas):
+    out = app.solve_max_guests(pd.DataFrame([_stock(pizzas)]), 60, RECIPE, FACTORS).iloc[0]
+    assert out["max_pizzas"] == pizzas
+    for name, factor in FACTORS.items():
+        n = int(out[app.GUESTS_MAX_PREFIX + name])
+        assert _pizzas({name: (factor, n)}) <= pizzas
+        assert _pizzas({name: (factor, n + 1)}) > pizzas
+
+
+def test_limiting_ingredient_across_columns():
+    stock = pd.DataFrame([
+        {**_stock(10), "salt_g": _stock(3)["salt_g"]},
+        {**_stock(10), "yeast_g": _stock(5)["yeast_g"] + 0.01},
+        _stock(10),
+    ])
+    out = app.solve_max_guests(stock, 60, RECIPE, FACTORS)
+    assert list(out["max_pizzas"]) == [3, 5, 10]
+    assert list(out["limiting"][:2]) == ["salt_g", "yeast_g"]
+
+
+def test_missing_column_is_unlimited_but_empty_cell_is_zero():
+    stock = pd.DataFrame([{"flour_g": _stock(4)["flour_g"], "salt_g": np.nan}, {"flour_g": _stock(4)["flour_g"], "salt_g": 1e6}])
+    out = app.solve_max_guests(stock, 60, RECIPE, FACTORS)
+    assert list(out["max_pizzas"]) == [0, 4]
+    assert out["limiting"][0] == "salt_g"
+    only_flour = app.solve_max_guests(stock[["flour_g"]], 60, RECIPE, FACTORS)
+    assert list(only_flour["max_pizzas"]) == [4, 4]
+
+
+def test_mix_units_serve_the_whole_mix():
+    mix = {"Kind": 3, "Hungrig": 2, "Normal": 0}
+    out = app.solve_max_guests(pd.DataFrame([_stock(9)]), 60, RECIPE, FACTORS, mix=mix).iloc[0]
+    units = int(out["mix_units"])
+    per_unit = lambda k: {n: (FACTORS[n], k * c) for n, c in mix.items()}  # noqa: E731
+    assert _pizzas(per_unit(units)) <= 9 < _pizzas(per_unit(units + 1))
+    assert out[app.GUESTS_MIX_PREFIX + "Kind"] == 3 * units
+    assert app.GUESTS_MIX_PREFIX + "Normal" not in out
+
+
+def test_eater_named_like_an_output_column_does_not_overwrite_it():
+    out = app.solve_max_guests(pd.DataFrame([_stock(5)]), 60, RECIPE, {"pizzas": 0.5, "units": 1.0}, mix={"units": 1}).iloc[0]
+    assert out["max_pizzas"] == 5
+    assert out[app.GUESTS_MAX_PREFIX + "pizzas"] == 10
+    assert out["mix_units"] == 5
+
+
+def test_inventory_without_usable_column_is_rejected():
+    with pytest.raises(ValueError, match="at least one of"):
+        app.solve_max_guests(pd.DataFrame([{"oil_g": 100.0}]), 60, RECIPE, FACTORS)